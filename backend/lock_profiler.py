@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Lock Profiler - optional wait/hold time instrumentation for shared locks
+
+Set LOCK_PROFILING=1 to wrap the server's locks; otherwise make_lock()
+returns plain threading locks and costs nothing.
+"""
+import os
+import time
+import threading
+from collections import deque
+
+ENABLED = os.environ.get('LOCK_PROFILING', '').lower() in ('1', 'true', 'yes')
+
+# Samples kept per lock for percentiles
+SAMPLE_SIZE = 20000
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+class InstrumentedLock:
+    """Lock/RLock wrapper that records how long callers wait for and hold it"""
+
+    def __init__(self, name, reentrant=False):
+        self.name = name
+        self.lock = threading.RLock() if reentrant else threading.Lock()
+        self.local = threading.local()
+        self.reset()
+
+    def reset(self):
+        self.acquisitions = 0
+        self.contended = 0
+        self.wait_total = 0.0
+        self.hold_total = 0.0
+        self.wait_samples = deque(maxlen=SAMPLE_SIZE)
+        self.hold_samples = deque(maxlen=SAMPLE_SIZE)
+        self.started_at = time.time()
+
+    def acquire(self, blocking=True, timeout=-1):
+        started = time.perf_counter()
+        acquired = self.lock.acquire(blocking, timeout)
+        if not acquired:
+            return False
+
+        depth = getattr(self.local, 'depth', 0)
+        self.local.depth = depth + 1
+        if depth == 0:
+            # Only the outermost acquire of a re-entrant lock counts
+            now = time.perf_counter()
+            waited = now - started
+            self.local.acquired_at = now
+            self.acquisitions += 1
+            self.wait_total += waited
+            self.wait_samples.append(waited)
+            if waited > 0.0001:
+                self.contended += 1
+        return True
+
+    def release(self):
+        self.local.depth -= 1
+        if self.local.depth == 0:
+            held = time.perf_counter() - self.local.acquired_at
+            self.hold_total += held
+            self.hold_samples.append(held)
+        self.lock.release()
+
+    # threading.Condition support
+    def _is_owned(self):
+        return getattr(self.local, 'depth', 0) > 0
+
+    __enter__ = acquire
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+    def snapshot(self):
+        elapsed = max(time.time() - self.started_at, 1e-9)
+        return {
+            'acquisitions': self.acquisitions,
+            'contended': self.contended,
+            'acquisitions_per_second': round(self.acquisitions / elapsed, 2),
+            'wait_total_s': round(self.wait_total, 6),
+            'hold_total_s': round(self.hold_total, 6),
+            # Fraction of wall time the lock was held / callers spent waiting
+            'utilization': round(self.hold_total / elapsed, 4),
+            'wait_ratio': round(self.wait_total / elapsed, 4),
+            'wait_us': _summary(self.wait_samples),
+            'hold_us': _summary(self.hold_samples),
+            'window_s': round(elapsed, 3)
+        }
+
+
+def make_lock(name, reentrant=False):
+    """Return a plain lock, or an instrumented one when LOCK_PROFILING is on"""
+    if not ENABLED:
+        return threading.RLock() if reentrant else threading.Lock()
+    lock = InstrumentedLock(name, reentrant)
+    with _registry_lock:
+        _registry[name] = lock
+    return lock
+
+
+def snapshot():
+    with _registry_lock:
+        locks = dict(_registry)
+    return {
+        'enabled': ENABLED,
+        'locks': {name: lock.snapshot() for name, lock in locks.items()}
+    }
+
+
+def reset():
+    with _registry_lock:
+        locks = list(_registry.values())
+    for lock in locks:
+        lock.reset()
+
+
+def _summary(samples):
+    ordered = sorted(samples)
+    if not ordered:
+        return {'p50': 0, 'p99': 0, 'max': 0}
+
+    def pick(percent):
+        index = min(len(ordered) - 1, int(round(percent / 100.0 * (len(ordered) - 1))))
+        return round(ordered[index] * 1e6, 2)
+
+    return {'p50': pick(50), 'p99': pick(99), 'max': round(ordered[-1] * 1e6, 2)}
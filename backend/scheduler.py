@@ -0,0 +1,478 @@
+#!/usr/bin/env python3
+"""
+Download Scheduler - Per-client fair queueing with priority lanes
+"""
+import os
+import math
+import queue
+import threading
+import time
+import itertools
+from collections import OrderedDict, deque
+
+from lock_profiler import make_lock
+
+# Lanes in priority order: small jobs first so they reach a worker quickly
+LANES = ['audio', 'short', 'standard', 'bulk']
+
+# Videos at or under this duration (seconds) go to the 'short' lane
+SHORT_DURATION_LIMIT = int(os.environ.get('SHORT_DURATION_LIMIT', 600))
+
+# Jobs waiting longer than this (seconds) are served before higher lanes
+MAX_LANE_WAIT = int(os.environ.get('MAX_LANE_WAIT', 300))
+
+# Queued jobs one client may have at a time (playlist entries included)
+MAX_QUEUED_PER_CLIENT = int(os.environ.get('MAX_QUEUED_PER_CLIENT', 200))
+
+# How many finished jobs and wait samples are kept for stats
+HISTORY_SIZE = 1000
+
+
+class QueueFullError(Exception):
+    """Raised when a client already has MAX_QUEUED_PER_CLIENT jobs waiting"""
+
+
+class DownloadJob:
+    def __init__(self, job_id, client_id, lane, params):
+        self.job_id = job_id
+        self.client_id = client_id
+        self.lane = lane
+        self.params = params
+        self.status = 'queued'
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.filepath = None
+        self.error = None
+        # Playlists are split into one bulk job per entry, so the worker is
+        # handed back between entries; the playlist job tracks its entries
+        self.parent = None
+        self.children = []
+        self.skipped = 0
+        self.cancel_requested = False
+
+    @property
+    def wait_time(self):
+        """Seconds spent in the queue (so far, if still queued)"""
+        end = self.started_at or self.finished_at or time.time()
+        return end - self.submitted_at
+
+    def to_dict(self):
+        return {
+            'job_id': self.job_id,
+            'lane': self.lane,
+            'status': self.status,
+            'url': self.params.get('url'),
+            'wait_time': round(self.wait_time, 3),
+            'submitted_at': self.submitted_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'filepath': self.filepath,
+            'error': self.error,
+            'parent': self.parent.job_id if self.parent else None,
+            'playlist': self._playlist_dict() if self.lane == 'bulk' and not self.parent else None
+        }
+
+    def _playlist_dict(self):
+        return {
+            'items': len(self.children),
+            'skipped': self.skipped,
+            'completed': sum(1 for child in self.children if child.status == 'completed'),
+            'failed': sum(1 for child in self.children if child.status == 'error'),
+            'entries': [child.job_id for child in self.children]
+        }
+
+
+class DownloadScheduler:
+    def __init__(self, downloader):
+        self.downloader = downloader
+        # One job at a time: the downloader holds a single job's status, process and worker
+        self.max_workers = 1
+        self.lock = make_lock('scheduler.lock')
+        self.job_available = threading.Condition(self.lock)
+        self.job_ids = itertools.count(1)
+
+        # lane -> OrderedDict(client_id -> deque of jobs); order is the round-robin order
+        self.lanes = {lane: OrderedDict() for lane in LANES}
+        self.jobs = OrderedDict()
+        self.active_jobs = {}
+
+        # video id -> duration in seconds, filled from yt-dlp metadata (probes and finished jobs)
+        self.duration_cache = {}
+        # Queued jobs whose duration is unknown, probed one at a time
+        self.probes = queue.Queue()
+
+        self.wait_samples = {lane: deque(maxlen=HISTORY_SIZE) for lane in LANES}
+        self.completed_count = {lane: 0 for lane in LANES}
+        self.workers = []
+
+    def start(self):
+        """Start worker threads (idempotent)"""
+        with self.lock:
+            if self.workers:
+                return
+            for i in range(self.max_workers):
+                worker = threading.Thread(target=self._worker_loop, name=f'download-worker-{i}')
+                worker.daemon = True
+                worker.start()
+                self.workers.append(worker)
+            prober = threading.Thread(target=self._probe_loop, name='metadata-probe')
+            prober.daemon = True
+            prober.start()
+            self.workers.append(prober)
+        print(f"🧵 Scheduler started with {self.max_workers} worker(s)")
+
+    def remember_duration(self, url, duration):
+        """Cache a video's duration (from extracted metadata) so later jobs can be classified"""
+        video_id = self.downloader._extract_video_id(url)
+        if not video_id:
+            return
+        try:
+            duration = float(duration)
+        except (TypeError, ValueError):
+            return
+        if not math.isfinite(duration) or duration <= 0:
+            return
+        with self.lock:
+            self.duration_cache[video_id] = duration
+
+    def classify(self, url, format_type):
+        """Pick a priority lane for a job"""
+        if 'list=' in url or '/playlist' in url:
+            return 'bulk'
+        if format_type == 'audio':
+            return 'audio'
+        video_id = self.downloader._extract_video_id(url)
+        with self.lock:
+            duration = self.duration_cache.get(video_id)
+        if duration is not None and duration <= SHORT_DURATION_LIMIT:
+            return 'short'
+        if '/shorts/' in url:
+            return 'short'
+        return 'standard'
+
+    def submit(self, client_id, params):
+        """Queue a download job (params are download_video kwargs) and return it"""
+        lane = self.classify(params['url'], params.get('format_type', 'video'))
+
+        with self.lock:
+            if self._client_queued_count(client_id) >= MAX_QUEUED_PER_CLIENT:
+                raise QueueFullError(f'{client_id} already has {MAX_QUEUED_PER_CLIENT} jobs queued')
+            job = DownloadJob(next(self.job_ids), client_id, lane, params)
+            self.jobs[job.job_id] = job
+            if lane == 'bulk':
+                # Playlist: the probe thread lists its entries and queues them
+                job.status = 'expanding'
+            else:
+                self.lanes[lane].setdefault(client_id, deque()).append(job)
+                self.job_available.notify()
+            self._trim_history()
+
+        if lane in ('bulk', 'standard'):
+            # Duration unknown: look it up so a short video can move to the short lane
+            self.probes.put(job)
+
+        print(f"🗂️ Job #{job.job_id} queued in '{lane}' lane for client {client_id}")
+        return job
+
+    def cancel_job(self, job_id):
+        """Remove a queued job or stop it if it is the running one"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if not job:
+                return False
+            if job.status == 'expanding' or job.children:
+                return self._cancel_playlist(job)
+            if job.status == 'running':
+                # Holding the lock keeps the next job from starting meanwhile
+                return job.job_id in self.active_jobs and self.downloader.cancel_download()
+            if job.status != 'queued':
+                return False
+            self._unqueue(job)
+            job.status = 'cancelled'
+            job.finished_at = time.time()
+            if job.parent:
+                self._refresh_playlist(job.parent)
+            return True
+
+    def _cancel_playlist(self, job):
+        """Drop a playlist's queued entries and stop the running one (caller holds the lock)"""
+        if job.status not in ('expanding', 'queued', 'running'):
+            return False
+        job.cancel_requested = True
+        if job.status == 'expanding':
+            job.status = 'cancelled'
+            job.finished_at = time.time()
+            return True
+        cancelled = False
+        for child in job.children:
+            if child.status == 'queued':
+                self._unqueue(child)
+                child.status = 'cancelled'
+                child.finished_at = time.time()
+                cancelled = True
+            elif child.status == 'running' and child.job_id in self.active_jobs:
+                cancelled = self.downloader.cancel_download() or cancelled
+        self._refresh_playlist(job)
+        return cancelled
+
+    def get_job(self, job_id, client_id):
+        """A job's state, or None if it does not exist or belongs to another client"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if not job or job.client_id != client_id:
+                return None
+            return job.to_dict()
+
+    def queue_position(self, job_id):
+        """Approximate number of jobs ahead of this one"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if not job or job.status != 'queued':
+                return 0
+            ahead = 0
+            for lane in LANES:
+                if lane == job.lane:
+                    ahead += sum(
+                        1 for queued in itertools.chain.from_iterable(self.lanes[lane].values())
+                        if queued.submitted_at < job.submitted_at
+                    )
+                    break
+                ahead += sum(len(q) for q in self.lanes[lane].values())
+            return ahead
+
+    def is_busy(self):
+        with self.lock:
+            return bool(self.active_jobs) or self._queued_count() > 0
+
+    def client_jobs(self, client_id):
+        """A client's running and queued jobs, oldest first"""
+        with self.lock:
+            return [
+                job.to_dict() for job in self.jobs.values()
+                if job.client_id == client_id and job.status in ('expanding', 'queued', 'running')
+            ]
+
+    def get_stats(self):
+        """Queue depth and wait-time percentiles per lane"""
+        with self.lock:
+            lanes = {}
+            for lane in LANES:
+                samples = sorted(self.wait_samples[lane])
+                waiting = [job for q in self.lanes[lane].values() for job in q]
+                lanes[lane] = {
+                    'queued': len(waiting),
+                    'clients': len(self.lanes[lane]),
+                    'completed': self.completed_count[lane],
+                    'oldest_wait': round(max((job.wait_time for job in waiting), default=0), 3),
+                    'wait_p50': _percentile(samples, 50),
+                    'wait_p95': _percentile(samples, 95),
+                    'wait_max': round(samples[-1], 3) if samples else 0,
+                    'samples': len(samples)
+                }
+            return {
+                'workers': self.max_workers,
+                'active': [job.to_dict() for job in self.active_jobs.values()],
+                'queued': self._queued_count(),
+                'lanes': lanes
+            }
+
+    def _queued_count(self):
+        return sum(len(q) for lane in LANES for q in self.lanes[lane].values())
+
+    def _client_queued_count(self, client_id):
+        expanding = sum(1 for job in self.jobs.values()
+                        if job.client_id == client_id and job.status == 'expanding')
+        return expanding + sum(len(self.lanes[lane].get(client_id, ())) for lane in LANES)
+
+    def _unqueue(self, job):
+        """Take a queued job out of its lane (caller holds the lock)"""
+        client_queue = self.lanes[job.lane].get(job.client_id)
+        if client_queue and job in client_queue:
+            client_queue.remove(job)
+            if not client_queue:
+                del self.lanes[job.lane][job.client_id]
+
+    def _probe_loop(self):
+        """Fetch durations of queued jobs and move short videos to the short lane"""
+        while True:
+            job = self.probes.get()
+            url = job.params['url']
+            if job.status == 'expanding':
+                self._expand_playlist(job)
+                continue
+            with self.lock:
+                if job.status != 'queued':
+                    continue
+                known = self.downloader._extract_video_id(url) in self.duration_cache
+            if not known:
+                info = self.downloader.probe(url)
+                if info:
+                    self.remember_duration(url, info.get('duration'))
+
+            lane = self.classify(url, job.params.get('format_type', 'video'))
+            with self.lock:
+                if job.status != 'queued' or lane == job.lane:
+                    continue
+                self._unqueue(job)
+                job.lane = lane
+                self.lanes[lane].setdefault(job.client_id, deque()).append(job)
+            print(f"🏷️ Job #{job.job_id} moved to '{lane}' lane after metadata probe")
+
+    def _expand_playlist(self, job):
+        """Queue one bulk job per playlist entry, within the client's queue limit"""
+        info = self.downloader.probe(job.params['url'])
+        entries = [entry for entry in (info or {}).get('entries') or [] if entry.get('url') or entry.get('id')]
+        for entry in entries:
+            self.remember_duration(_entry_url(entry), entry.get('duration'))
+
+        with self.lock:
+            if job.status != 'expanding':
+                return
+            if not entries:
+                job.status = 'error'
+                job.error = 'Gagal membaca playlist' if info is None else 'Playlist kosong'
+                job.finished_at = time.time()
+                return
+            room = max(0, MAX_QUEUED_PER_CLIENT - self._client_queued_count(job.client_id) + 1)
+            job.skipped = max(0, len(entries) - room)
+            for entry in entries[:room]:
+                child = DownloadJob(next(self.job_ids), job.client_id, 'bulk', dict(job.params, url=_entry_url(entry)))
+                child.parent = job
+                job.children.append(child)
+                self.jobs[child.job_id] = child
+                self.lanes['bulk'].setdefault(job.client_id, deque()).append(child)
+            self._refresh_playlist(job)
+            self._trim_history()
+            self.job_available.notify_all()
+
+        print(f"📃 Job #{job.job_id}: playlist split into {len(job.children)} job(s)"
+              + (f", {job.skipped} skipped (queue limit)" if job.skipped else ''))
+
+    def _refresh_playlist(self, job):
+        """Derive a playlist job's status from its entries (caller holds the lock)"""
+        statuses = [child.status for child in job.children]
+        if 'running' in statuses:
+            job.status = 'running'
+            job.started_at = job.started_at or time.time()
+            return
+        if 'queued' in statuses:
+            job.status = 'running' if job.started_at else 'queued'
+            return
+
+        job.finished_at = time.time()
+        failed = statuses.count('error')
+        if job.cancel_requested:
+            job.status = 'cancelled'
+        elif statuses.count('completed'):
+            job.status = 'completed'
+            if failed:
+                job.error = f'{failed} dari {len(statuses)} item gagal'
+        elif failed:
+            job.status = 'error'
+            job.error = 'Semua item playlist gagal'
+        elif not statuses:
+            job.status = 'error'
+            job.error = 'Antrian penuh'
+        else:
+            job.status = 'cancelled'
+
+    def _next_job(self):
+        """Pop the next job: starved lanes first, then lane priority, round-robin per client"""
+        now = time.time()
+        chosen_lane = None
+
+        for lane in LANES:
+            clients = self.lanes[lane]
+            if clients and any(now - q[0].submitted_at > MAX_LANE_WAIT for q in clients.values()):
+                chosen_lane = lane
+                break
+
+        if chosen_lane is None:
+            for lane in LANES:
+                if self.lanes[lane]:
+                    chosen_lane = lane
+                    break
+
+        if chosen_lane is None:
+            return None
+
+        # Take the head of the first client's queue, then rotate that client to the back
+        clients = self.lanes[chosen_lane]
+        client_id, client_queue = next(iter(clients.items()))
+        job = client_queue.popleft()
+        if client_queue:
+            clients.move_to_end(client_id)
+        else:
+            del clients[client_id]
+        return job
+
+    def _worker_loop(self):
+        while True:
+            with self.lock:
+                job = self._next_job()
+                while job is None:
+                    self.job_available.wait()
+                    job = self._next_job()
+                job.status = 'running'
+                job.started_at = time.time()
+                self.active_jobs[job.job_id] = job
+                self.wait_samples[job.lane].append(job.wait_time)
+                if job.parent:
+                    self._refresh_playlist(job.parent)
+
+            print(f"▶️ Job #{job.job_id} ({job.lane}) started after {job.wait_time:.2f}s in queue")
+
+            success = False
+            try:
+                success = self.downloader.download_video(**job.params)
+            except Exception as e:
+                print(f"❌ Error in download worker: {e}")
+            finally:
+                final_status = self.downloader.get_status()
+                self.remember_duration(job.params['url'], final_status.get('duration'))
+                with self.lock:
+                    self.active_jobs.pop(job.job_id, None)
+                    job.filepath = (final_status.get('filepath') if success else None) or None
+                    job.finished_at = time.time()
+                    if job.status == 'running':
+                        if final_status['status'] == 'cancelled':
+                            job.status = 'cancelled'
+                        else:
+                            job.status = 'completed' if success else 'error'
+                    if job.status == 'error':
+                        job.error = final_status.get('error_message') or final_status.get('message')
+                    self.completed_count[job.lane] += 1
+                    if job.parent:
+                        self._refresh_playlist(job.parent)
+
+    def _trim_history(self):
+        """Forget the oldest finished jobs so the job table stays bounded"""
+        excess = len(self.jobs) - HISTORY_SIZE
+        if excess <= 0:
+            return
+        for job_id in list(self.jobs):
+            if excess <= 0:
+                break
+            job = self.jobs.get(job_id)
+            # Playlist entries go together with their playlist job
+            if job and job.status not in ('expanding', 'queued', 'running') and not job.parent:
+                for child in job.children:
+                    self.jobs.pop(child.job_id, None)
+                del self.jobs[job_id]
+                excess -= 1 + len(job.children)
+
+
+def _entry_url(entry):
+    """Watch URL of a flat playlist entry"""
+    url = entry.get('url') or ''
+    if url.startswith('http'):
+        return url
+    return f"https://www.youtube.com/watch?v={entry.get('id') or url}"
+
+
+def _percentile(sorted_samples, percent):
+    if not sorted_samples:
+        return 0
+    index = min(len(sorted_samples) - 1, int(round(percent / 100.0 * (len(sorted_samples) - 1))))
+    return round(sorted_samples[index], 3)
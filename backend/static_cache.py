@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Static Asset Cache - fingerprinted, precompressed frontend files served from memory
+
+At startup every frontend file is read once, hashed and compressed with
+gzip (and brotli when the optional `brotli` package is installed).
+index.html is rewritten to reference fingerprinted names such as
+style.3f2a9c1b.css, which can be cached forever; index.html itself is
+revalidated with its ETag on every load.
+"""
+import os
+import re
+import gzip
+import hashlib
+import mimetypes
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Files smaller than this are not worth compressing
+MIN_COMPRESS_SIZE = 256
+
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+
+# q-value of identity when Accept-Encoding does not mention it
+IMPLICIT_IDENTITY_Q = 0.001
+
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE = 'no-cache'
+
+
+class StaticAsset:
+    def __init__(self, name, data, content_type):
+        self.name = name
+        self.content_type = content_type
+        self.digest = hashlib.sha256(data).hexdigest()
+        self.cache_control = REVALIDATE_CACHE
+        self.variants = {'identity': data}
+
+        if len(data) >= MIN_COMPRESS_SIZE and content_type.startswith(COMPRESSIBLE_TYPES):
+            compressed = gzip.compress(data, compresslevel=9, mtime=0)
+            if len(compressed) < len(data):
+                self.variants['gzip'] = compressed
+            if brotli is not None:
+                compressed = brotli.compress(data, quality=11)
+                if len(compressed) < len(data):
+                    self.variants['br'] = compressed
+
+    def immutable_copy(self, name):
+        """Same bytes under another name, cacheable forever"""
+        copy = StaticAsset.__new__(StaticAsset)
+        copy.__dict__.update(self.__dict__)
+        copy.name = name
+        copy.cache_control = IMMUTABLE_CACHE
+        return copy
+
+    def etag(self, encoding):
+        """Strong ETag per representation"""
+        if encoding == 'identity':
+            return f'"{self.digest[:32]}"'
+        return f'"{self.digest[:32]}-{encoding}"'
+
+    def fingerprinted_name(self):
+        root, ext = os.path.splitext(self.name)
+        return f'{root}.{self.digest[:8]}{ext}'
+
+
+class StaticAssetCache:
+    def __init__(self):
+        self.assets = {}
+
+    def load(self, frontend_dir):
+        """Read, fingerprint and precompress every file in the frontend directory"""
+        assets = {}
+        fingerprints = {}
+
+        if not os.path.isdir(frontend_dir):
+            self.assets = assets
+            return self
+
+        for name in sorted(os.listdir(frontend_dir)):
+            path = os.path.join(frontend_dir, name)
+            if not os.path.isfile(path) or name.endswith('.html'):
+                continue
+            with open(path, 'rb') as f:
+                data = f.read()
+            content_type = _content_type(name)
+
+            # Original name stays available (revalidated) for old pages and bookmarks
+            assets[name] = StaticAsset(name, data, content_type)
+            fingerprinted = assets[name].fingerprinted_name()
+            assets[fingerprinted] = assets[name].immutable_copy(fingerprinted)
+            fingerprints[name] = fingerprinted
+
+        for name in sorted(os.listdir(frontend_dir)):
+            path = os.path.join(frontend_dir, name)
+            if not os.path.isfile(path) or not name.endswith('.html'):
+                continue
+            with open(path, 'r', encoding='utf-8') as f:
+                html = _rewrite_references(f.read(), fingerprints)
+            assets[name] = StaticAsset(name, html.encode('utf-8'), _content_type(name))
+
+        self.assets = assets
+        return self
+
+    def get(self, name):
+        return self.assets.get(name)
+
+
+def negotiate_encoding(accept_encoding, available):
+    """Pick the available encoding with the highest q-value (br, then gzip on ties)
+
+    Returns None when nothing available is acceptable, e.g. identity;q=0
+    for an asset without compressed variants.
+    """
+    accepted = {}
+    for part in (accept_encoding or '').split(','):
+        pieces = part.strip().split(';')
+        coding = pieces[0].strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in pieces[1:]:
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding] = quality
+
+    def quality(encoding):
+        if encoding in accepted:
+            return accepted[encoding]
+        if '*' in accepted:
+            return accepted['*']
+        # identity is acceptable unless refused, but any accepted coding beats it
+        return IMPLICIT_IDENTITY_Q if encoding == 'identity' else 0.0
+
+    candidates = [encoding for encoding in ('br', 'gzip') if encoding in available] + ['identity']
+    best = max(candidates, key=quality)  # max() keeps the first of equal candidates
+    return best if quality(best) > 0 else None
+
+
+def _content_type(name):
+    content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    if content_type.startswith('text/') or content_type == 'application/javascript':
+        content_type += '; charset=utf-8'
+    return content_type
+
+
+def _rewrite_references(html, fingerprints):
+    """Point local src/href attributes at fingerprinted file names"""
+    def replace(match):
+        attribute, quote, target = match.group(1), match.group(2), match.group(3)
+        return f'{attribute}={quote}{fingerprints.get(target, target)}{quote}'
+
+    return re.sub(r'\b(src|href)=(["\'])([^"\']+)\2', replace, html)
@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+Prewarmed yt-dlp Worker Pool - long-lived processes that already imported yt-dlp
+
+Each worker is this file started as a script. It speaks newline-delimited
+JSON: jobs arrive on stdin, progress and results go back on the original
+stdout. yt-dlp's own console output is redirected to stderr.
+"""
+import os
+import sys
+import json
+import time
+import queue
+import threading
+import subprocess
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Defaults, overridable via environment
+POOL_SIZE = int(os.environ.get('YTDLP_POOL_SIZE', 2))
+WORKER_MAX_JOBS = int(os.environ.get('YTDLP_WORKER_MAX_JOBS', 20))
+WORKER_MAX_RSS_MB = int(os.environ.get('YTDLP_WORKER_MAX_RSS_MB', 512))
+WORKER_START_TIMEOUT = 60
+
+
+class WorkerError(Exception):
+    """Raised when a worker dies, times out or cannot be started"""
+
+
+class PrewarmedWorker:
+    def __init__(self, stderr=None):
+        self.jobs_done = 0
+        self.jobs_started = 0
+        self.rss_mb = 0
+        self.messages = queue.Queue()
+        # cancel() comes from request threads while run() writes jobs
+        self.send_lock = threading.Lock()
+        self.process = subprocess.Popen(
+            [sys.executable, '-u', os.path.abspath(__file__)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=stderr,
+            universal_newlines=True,
+            bufsize=1,
+            encoding='utf-8',
+            errors='replace'
+        )
+        self.reader = threading.Thread(target=self._read_messages)
+        self.reader.daemon = True
+        self.reader.start()
+
+        try:
+            ready = self.next_message(timeout=WORKER_START_TIMEOUT)
+        except WorkerError:
+            self.kill()
+            raise
+        if ready.get('type') != 'ready':
+            self.kill()
+            raise WorkerError(f"Worker failed to start: {ready}")
+        self.pid = ready['pid']
+        self.version = ready['version']
+        self.startup_time = ready['startup']
+
+    def _read_messages(self):
+        for line in iter(self.process.stdout.readline, ''):
+            try:
+                self.messages.put(json.loads(line))
+            except ValueError:
+                continue
+        self.messages.put({'type': 'exit'})
+
+    def send(self, message):
+        try:
+            with self.send_lock:
+                self.process.stdin.write(json.dumps(message) + '\n')
+                self.process.stdin.flush()
+        except (OSError, ValueError) as e:
+            raise WorkerError(f"Worker pipe closed: {e}")
+
+    def next_message(self, timeout=None):
+        try:
+            message = self.messages.get(timeout=timeout)
+        except queue.Empty:
+            raise WorkerError('Worker timed out')
+        if message.get('type') == 'exit':
+            raise WorkerError('Worker exited unexpectedly')
+        return message
+
+    def cancel(self):
+        """Ask the current job to stop at its next progress callback"""
+        try:
+            # Tagged with the job so a late cancel cannot hit the next one
+            self.send({'type': 'cancel', 'job': self.jobs_started})
+        except WorkerError:
+            pass
+
+    def is_alive(self):
+        return self.process.poll() is None
+
+    def stop(self):
+        try:
+            self.send({'type': 'stop'})
+            self.process.wait(timeout=5)
+        except (WorkerError, subprocess.TimeoutExpired):
+            self.kill()
+
+    def kill(self):
+        if self.is_alive():
+            self.process.kill()
+            self.process.wait()
+
+
+class WorkerPool:
+    def __init__(self, size=POOL_SIZE, max_jobs=WORKER_MAX_JOBS, max_rss_mb=WORKER_MAX_RSS_MB):
+        self.size = size
+        self.max_jobs = max_jobs
+        self.max_rss_mb = max_rss_mb
+        self.idle = queue.Queue()
+        self.lock = threading.Lock()
+        self.started = False
+        self.recycled = 0
+
+    def start(self):
+        """Spawn all workers in the background (idempotent)"""
+        with self.lock:
+            if self.started:
+                return
+            self.started = True
+        for _ in range(self.size):
+            threading.Thread(target=self._spawn, daemon=True).start()
+
+    def _spawn(self):
+        try:
+            worker = PrewarmedWorker()
+            print(f"🔥 yt-dlp worker {worker.pid} ready in {worker.startup_time:.2f}s")
+            self.idle.put(worker)
+        except Exception as e:
+            print(f"❌ Failed to start yt-dlp worker: {e}")
+            # Keep the pool size stable; a later acquire() will retry
+            self.idle.put(None)
+
+    def acquire(self, timeout=WORKER_START_TIMEOUT):
+        self.start()
+        try:
+            worker = self.idle.get(timeout=timeout)
+        except queue.Empty:
+            raise WorkerError('No yt-dlp worker available')
+        if worker is None or not worker.is_alive():
+            try:
+                worker = PrewarmedWorker()
+            except Exception as e:
+                # Give the slot back so a later acquire() can retry
+                self.idle.put(None)
+                raise WorkerError(f'Could not start yt-dlp worker: {e}')
+        return worker
+
+    def release(self, worker, broken=False):
+        """Return a worker, recycling it when it is broken, old or too big"""
+        if broken or not worker.is_alive():
+            reason = 'broken'
+        elif worker.jobs_done >= self.max_jobs:
+            reason = f'{worker.jobs_done} jobs'
+        elif worker.rss_mb >= self.max_rss_mb:
+            reason = f'{worker.rss_mb:.0f} MB RSS'
+        else:
+            self.idle.put(worker)
+            return
+
+        print(f"♻️ Recycling yt-dlp worker {worker.pid} ({reason})")
+        with self.lock:
+            self.recycled += 1
+        threading.Thread(target=worker.stop, daemon=True).start()
+        threading.Thread(target=self._spawn, daemon=True).start()
+
+    def run(self, args, on_message=None, timeout=None, quiet=False, on_start=None, extract=False):
+        """Run yt-dlp CLI arguments in a warm worker and return its exit code
+
+        on_message receives each progress/postprocess/info message; on_start
+        receives the worker so callers can cancel it. With extract=True the
+        worker only extracts metadata and sends it as one 'info' message.
+        """
+        worker = self.acquire()
+        broken = False
+        deadline = time.time() + timeout if timeout else None
+        worker.jobs_started += 1
+        try:
+            if on_start:
+                on_start(worker)
+            worker.send({'type': 'run', 'job': worker.jobs_started, 'args': args,
+                         'quiet': quiet, 'extract': extract})
+            while True:
+                remaining = max(0.0, deadline - time.time()) if deadline else None
+                message = worker.next_message(timeout=remaining)
+                if message['type'] == 'done':
+                    worker.jobs_done += 1
+                    worker.rss_mb = message.get('rss_mb', 0)
+                    if message.get('error'):
+                        print(f"⚠️ Worker job error: {message['error']}")
+                    return message['returncode']
+                if on_message:
+                    on_message(message)
+        except WorkerError:
+            broken = True
+            worker.kill()
+            raise
+        finally:
+            self.release(worker, broken=broken)
+
+    def extract(self, args, timeout=None):
+        """Metadata for the URL in args without downloading it, or None on failure"""
+        found = {}
+
+        def keep(message):
+            if message['type'] == 'info':
+                found['info'] = message['info']
+
+        returncode = self.run(args, on_message=keep, timeout=timeout, quiet=True, extract=True)
+        return found.get('info') if returncode == 0 else None
+
+    def version(self, timeout=10):
+        worker = self.acquire(timeout=timeout)
+        self.release(worker)
+        return worker.version
+
+    def get_stats(self):
+        return {
+            'size': self.size,
+            'idle': self.idle.qsize(),
+            'recycled': self.recycled,
+            'max_jobs': self.max_jobs,
+            'max_rss_mb': self.max_rss_mb
+        }
+
+
+# Worker process side
+
+def _current_rss_mb():
+    """Resident memory in MB, or 0 (never recycle on RSS) when it cannot be measured"""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return 0
+    # Peak RSS: bytes on macOS, KiB on Linux and the BSDs
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss / (1024 * 1024) if sys.platform == 'darwin' else max_rss / 1024
+
+
+def _info_summary(info):
+    """The metadata fields the scheduler uses (full info dicts are large)"""
+    summary = {key: info.get(key) for key in ('_type', 'id', 'title', 'duration')}
+    if info.get('entries') is not None:
+        summary['entries'] = [
+            {key: entry.get(key) for key in ('id', 'url', 'title', 'duration')}
+            for entry in info['entries'] if entry
+        ]
+    return summary
+
+
+def _worker_main():
+    started = time.time()
+
+    # Keep the protocol channel private; yt-dlp prints to fd 1
+    protocol = os.fdopen(os.dup(1), 'w', encoding='utf-8', buffering=1)
+    os.dup2(2, 1)
+    sys.stdout = sys.stderr
+
+    import yt_dlp
+    from yt_dlp.utils import DownloadCancelled, DownloadError
+
+    send_lock = threading.Lock()
+
+    def send(message):
+        with send_lock:
+            protocol.write(json.dumps(message) + '\n')
+
+    jobs = queue.Queue()
+    # Numbers of jobs asked to stop; a cancel may arrive before its run message
+    cancelled = set()
+    current = {'job': None}
+
+    def read_commands():
+        for line in sys.stdin:
+            try:
+                message = json.loads(line)
+            except ValueError:
+                continue
+            if message.get('type') == 'cancel':
+                cancelled.add(message.get('job'))
+            else:
+                jobs.put(message)
+        jobs.put({'type': 'stop'})
+
+    reader = threading.Thread(target=read_commands, daemon=True)
+    reader.start()
+
+    def progress_hook(d):
+        if current['job'] in cancelled:
+            raise DownloadCancelled()
+        send({
+            'type': 'progress',
+            'status': d.get('status'),
+            'filename': d.get('filename'),
+            'downloaded_bytes': d.get('downloaded_bytes'),
+            'total_bytes': d.get('total_bytes') or d.get('total_bytes_estimate'),
+            'speed': d.get('speed'),
+            'eta': d.get('eta'),
+            'duration': (d.get('info_dict') or {}).get('duration')
+        })
+
+    def postprocessor_hook(d):
+        send({
+            'type': 'postprocess',
+            'status': d.get('status'),
+            'postprocessor': d.get('postprocessor'),
+            'filepath': (d.get('info_dict') or {}).get('filepath')
+        })
+
+    send({
+        'type': 'ready',
+        'pid': os.getpid(),
+        'version': yt_dlp.version.__version__,
+        'startup': time.time() - started
+    })
+
+    while True:
+        job = jobs.get()
+        if job.get('type') == 'stop':
+            break
+
+        current['job'] = job.get('job')
+        returncode, error = 1, None
+        try:
+            if current['job'] in cancelled:
+                raise DownloadCancelled()
+            parsed = yt_dlp.parse_options(job['args'])
+            ydl_opts = dict(parsed.ydl_opts)
+            ydl_opts['progress_hooks'] = [progress_hook]
+            ydl_opts['postprocessor_hooks'] = [postprocessor_hook]
+            if job.get('quiet'):
+                ydl_opts.update({'quiet': True, 'forcejson': False, 'noprogress': True})
+            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                if job.get('extract'):
+                    info = ydl.extract_info(parsed.urls[0], download=False)
+                    if info:
+                        send({'type': 'info', 'info': _info_summary(ydl.sanitize_info(info))})
+                    returncode = 0 if info else 1
+                else:
+                    returncode = ydl.download(parsed.urls)
+        except DownloadCancelled:
+            returncode, error = 1, 'cancelled'
+        except DownloadError as e:
+            error = str(e)[:200]
+        except SystemExit as e:
+            returncode = e.code if isinstance(e.code, int) else 2
+        except Exception as e:
+            error = f'{type(e).__name__}: {str(e)[:200]}'
+
+        send({'type': 'done', 'returncode': returncode, 'error': error, 'rss_mb': _current_rss_mb()})
+        cancelled.discard(current['job'])
+
+
+if __name__ == '__main__':
+    _worker_main()
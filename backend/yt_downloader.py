@@ -4,13 +4,29 @@ YouTube Downloader Backend - Optimized Version
 """
 import os
 import subprocess
-import threading
 import time
 import re
 import json
 from datetime import datetime
 from pathlib import Path
 
+from worker_pool import WorkerPool, WorkerError
+from lock_profiler import make_lock
+
+def _default_engine():
+    """Use prewarmed workers when yt-dlp is importable, else the CLI"""
+    try:
+        import importlib.util
+        return 'pool' if importlib.util.find_spec('yt_dlp') else 'subprocess'
+    except Exception:
+        return 'subprocess'
+
+# Metadata probes (duration, playlist entries) give up after this many seconds
+PROBE_TIMEOUT = 30
+
+# 'pool' (prewarmed worker processes) or 'subprocess' (one yt-dlp per job)
+DOWNLOAD_ENGINE = os.environ.get('DOWNLOAD_ENGINE') or _default_engine()
+
 class YouTubeDownloader:
     def __init__(self):
         self.current_process = None
@@ -27,10 +43,25 @@ class YouTubeDownloader:
             'filesize': '0 MB',
             'downloaded': '0 MB'
         }
-        self.download_lock = threading.Lock()
+        # Re-entrant: get_status() calls reset_status() while holding it
+        self.download_lock = make_lock('downloader.download_lock', reentrant=True)
         self.last_update_time = time.time()
         self.current_url = None
         self.output_path = None
+        self.current_worker = None
+        self.engine = DOWNLOAD_ENGINE
+        self.worker_pool = WorkerPool() if self.engine == 'pool' else None
+        self.job_started_at = None
+
+    def get_ytdlp_version(self):
+        """Return the yt-dlp version string, or None if unavailable"""
+        if self.worker_pool:
+            try:
+                return self.worker_pool.version()
+            except WorkerError as e:
+                print(f"⚠️ Worker pool unavailable: {e}")
+        result = subprocess.run(['yt-dlp', '--version'], capture_output=True, text=True)
+        return result.stdout.strip() if result.returncode == 0 else None
 
     def reset_status(self):
         """Reset download status to idle"""
@@ -59,8 +90,7 @@ class YouTubeDownloader:
         for browser in browsers:
             try:
                 # Coba dengan berbagai browser
-                cmd = [
-                    'yt-dlp', 
+                args = [
                     '--cookies-from-browser', browser,
                     '--dump-json',
                     '--no-warnings',
@@ -69,6 +99,9 @@ class YouTubeDownloader:
                     'https://www.youtube.com/watch?v=dQw4w9WgXcQ'
                 ]
                 
+                # Always a short-lived process, even with the worker pool: keyring
+                # access needs this environment, and a timeout must not cost a warm worker
+                cmd = ['yt-dlp'] + args
                 result = subprocess.run(
                     cmd, 
                     capture_output=True, 
@@ -101,58 +134,94 @@ class YouTubeDownloader:
                 return match.group(1)
         return None
     
+    def _build_probe_args(self, url):
+        """yt-dlp arguments that only read metadata; playlists are listed, not resolved"""
+        return [
+            '--no-warnings',
+            '--flat-playlist',
+            '--geo-bypass',
+            '--force-ipv4',
+            '--user-agent', 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+            '--extractor-args', 'youtube:player_client=android,ios,web',
+            '--no-check-certificate',
+            url
+        ]
+    
+    def probe(self, url, timeout=PROBE_TIMEOUT):
+        """Fetch metadata (duration, playlist entries) without downloading; None on failure"""
+        args = self._build_probe_args(url)
+        try:
+            if self.worker_pool:
+                return self.worker_pool.extract(args, timeout=timeout)
+            result = subprocess.run(
+                ['yt-dlp', '-J'] + args,
+                capture_output=True,
+                text=True,
+                timeout=timeout,
+                encoding='utf-8',
+                errors='replace'
+            )
+            return json.loads(result.stdout) if result.returncode == 0 else None
+        except (WorkerError, subprocess.TimeoutExpired, OSError, ValueError) as e:
+            print(f"⚠️ Metadata probe failed for {url}: {e}")
+            return None
+    
+    def _build_ytdlp_args(self, url, quality, format_type, concurrent_fragments):
+        """Build yt-dlp CLI arguments (without the executable) for a download"""
+        # Setup save path
+        home = os.path.expanduser("~")
+        save_path = os.path.join(home, "Downloads", "YouTube_Downloads")
+        os.makedirs(save_path, exist_ok=True)
+        output_template = f'{save_path}/%(title)s.%(ext)s'
+        
+        # AGGRESSIVE BYPASS OPTIONS
+        args = [
+            '--no-warnings',
+            '--newline',
+            '--progress',
+            # BYPASS OPTIONS MAXIMAL
+            '--geo-bypass',
+            '--geo-bypass-country', 'US',
+            '--force-ipv4',
+            '--user-agent', 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+            '--referer', 'https://www.youtube.com/',
+            '--sleep-interval', '3',
+            '--max-sleep-interval', '8',
+            '--retries', '15',
+            '--fragment-retries', '15',
+            '--skip-unavailable-fragments',
+            '--concurrent-fragments', str(concurrent_fragments),
+            '--throttled-rate', '100K',
+            # Extractors khusus
+            '--extractor-args', 'youtube:player_client=android,ios,web',
+            '--youtube-include-dash-manifest',
+            '--youtube-include-hls-manifest',
+            '--compat-options', 'no-youtube-unavailable-video',
+            '--no-check-certificate',
+            '-o', output_template
+        ]
+        
+        # Format selection dengan FALLBACK
+        if format_type == 'video':
+            if quality == 'best':
+                args.extend(['-f', 'bestvideo[height<=1080]+bestaudio/best[height<=1080]/bestvideo[height<=720]+bestaudio/best[height<=720]/best'])
+            elif quality == '720p':
+                args.extend(['-f', 'bestvideo[height<=720]+bestaudio/best[height<=720]/bestvideo[height<=480]+bestaudio'])
+            elif quality == '480p':
+                args.extend(['-f', 'bestvideo[height<=480]+bestaudio/best[height<=480]/bestvideo[height<=360]+bestaudio'])
+            elif quality == '360p':
+                args.extend(['-f', 'bestvideo[height<=360]+bestaudio/best[height<=360]/worstvideo+worstaudio'])
+            args.extend(['--merge-output-format', 'mp4'])
+        elif format_type == 'audio':
+            args.extend(['-f', 'bestaudio[acodec=mp4a]/bestaudio/bestaudio/best', '-x', '--audio-format', 'mp3', '--audio-quality', '320K'])
+        
+        args.append(url)
+        return args
+    
     def _download_with_ytdlp_aggressive(self, url, quality, format_type, concurrent_fragments):
         """AGGRESSIVE METHOD untuk bypass YouTube blocking"""
         try:
-            # Setup save path
-            home = os.path.expanduser("~")
-            save_path = os.path.join(home, "Downloads", "YouTube_Downloads")
-            os.makedirs(save_path, exist_ok=True)
-            output_template = f'{save_path}/%(title)s.%(ext)s'
-            
-            # AGGRESSIVE BYPASS OPTIONS
-            cmd = [
-                'yt-dlp',
-                '--no-warnings',
-                '--newline',
-                '--progress',
-                # BYPASS OPTIONS MAXIMAL
-                '--geo-bypass',
-                '--geo-bypass-country', 'US',
-                '--force-ipv4',
-                '--user-agent', 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                '--referer', 'https://www.youtube.com/',
-                '--sleep-interval', '3',
-                '--max-sleep-interval', '8',
-                '--retries', '15',
-                '--fragment-retries', '15',
-                '--skip-unavailable-fragments',
-                '--concurrent-fragments', str(concurrent_fragments),
-                '--throttled-rate', '100K',
-                # Extractors khusus
-                '--extractor-args', 'youtube:player_client=android,ios,web',
-                '--youtube-include-dash-manifest',
-                '--youtube-include-hls-manifest',
-                '--compat-options', 'no-youtube-unavailable-video',
-                '--no-check-certificate',
-                '-o', output_template
-            ]
-            
-            # Format selection dengan FALLBACK
-            if format_type == 'video':
-                if quality == 'best':
-                    cmd.extend(['-f', 'bestvideo[height<=1080]+bestaudio/best[height<=1080]/bestvideo[height<=720]+bestaudio/best[height<=720]/best'])
-                elif quality == '720p':
-                    cmd.extend(['-f', 'bestvideo[height<=720]+bestaudio/best[height<=720]/bestvideo[height<=480]+bestaudio'])
-                elif quality == '480p':
-                    cmd.extend(['-f', 'bestvideo[height<=480]+bestaudio/best[height<=480]/bestvideo[height<=360]+bestaudio'])
-                elif quality == '360p':
-                    cmd.extend(['-f', 'bestvideo[height<=360]+bestaudio/best[height<=360]/worstvideo+worstaudio'])
-                cmd.extend(['--merge-output-format', 'mp4'])
-            elif format_type == 'audio':
-                cmd.extend(['-f', 'bestaudio[acodec=mp4a]/bestaudio/bestaudio/best', '-x', '--audio-format', 'mp3', '--audio-quality', '320K'])
-            
-            cmd.append(url)
+            cmd = ['yt-dlp'] + self._build_ytdlp_args(url, quality, format_type, concurrent_fragments)
             
             print(f"🚀 AGGRESSIVE METHOD: {' '.join(cmd[:10])}...")
             
@@ -199,6 +268,89 @@ class YouTubeDownloader:
             traceback.print_exc()
             return False
     
+    def _download_with_worker_pool(self, url, quality, format_type, concurrent_fragments):
+        """Same options as the aggressive method, run in a prewarmed yt-dlp worker"""
+        try:
+            args = self._build_ytdlp_args(url, quality, format_type, concurrent_fragments)
+            print(f"🔥 PREWARMED WORKER: {' '.join(args[:9])}...")
+            
+            def attach(worker):
+                with self.download_lock:
+                    self.current_worker = worker
+                    cancelled = self.download_status['status'] == 'cancelled'
+                if cancelled:
+                    worker.cancel()
+            
+            try:
+                return_code = self.worker_pool.run(args, on_message=self._apply_progress, on_start=attach)
+            finally:
+                with self.download_lock:
+                    self.current_worker = None
+            
+            if return_code == 0:
+                print("✅ Download successful with prewarmed worker")
+                return True
+            else:
+                print(f"❌ Prewarmed worker failed with code: {return_code}")
+                return False
+                
+        except Exception as e:
+            print(f"💥 Prewarmed worker error: {e}")
+            import traceback
+            traceback.print_exc()
+            return False
+    
+    def _apply_progress(self, message):
+        """Update status from a structured worker message"""
+        try:
+            with self.download_lock:
+                if message['type'] == 'postprocess':
+                    if message.get('filepath'):
+                        self.download_status['filename'] = os.path.basename(message['filepath'])
+                        self.download_status['filepath'] = message['filepath']
+                    if message.get('status') == 'started':
+                        self.download_status['message'] = f"Processing: {message.get('postprocessor')}"
+                    self.last_update_time = time.time()
+                    return
+                
+                downloaded = message.get('downloaded_bytes') or 0
+                total = message.get('total_bytes')
+                
+                if message.get('filename'):
+                    self.download_status['filename'] = os.path.basename(message['filename'])
+                    self.download_status['filepath'] = message['filename']
+                if message.get('duration'):
+                    self.download_status['duration'] = message['duration']
+                
+                if downloaded:
+                    self._mark_first_byte()
+                    self.download_status['downloaded'] = _format_bytes(downloaded)
+                if total:
+                    percent = min(100.0, downloaded * 100.0 / total)
+                    self.download_status['filesize'] = _format_bytes(total)
+                    self.download_status['progress'] = percent
+                    self.download_status['message'] = f'Downloading: {percent:.1f}%'
+                if message.get('speed'):
+                    self.download_status['speed'] = _format_bytes(message['speed']) + '/s'
+                if message.get('eta') is not None:
+                    minutes, seconds = divmod(int(message['eta']), 60)
+                    self.download_status['eta'] = f'{minutes:02d}:{seconds:02d}'
+                if message.get('status') == 'finished' and self.download_status['progress'] < 100:
+                    self.download_status['progress'] = 100
+                
+                self.last_update_time = time.time()
+        except Exception as e:
+            print(f"⚠️ Progress error: {e}")
+    
+    def _mark_first_byte(self):
+        """Record time-to-first-byte for the current job (caller holds download_lock)"""
+        if self.job_started_at and self.download_status.get('ttfb') is None:
+            ttfb = time.time() - self.job_started_at
+            self.download_status['ttfb'] = round(ttfb, 3)
+            if self.download_status['status'] == 'starting':
+                self.download_status['status'] = 'downloading'
+            print(f"⏱️ Time to first byte ({self.engine}): {ttfb:.2f}s")
+    
     def download_video(self, url, quality='best', format_type='video', 
                       custom_path=None, max_speed=None, concurrent_fragments=5):
         """Download YouTube video dengan multiple fallback methods"""
@@ -217,17 +369,25 @@ class YouTubeDownloader:
                 'speed': '0 KB/s',
                 'eta': '--:--',
                 'filesize': '0 MB',
-                'downloaded': '0 MB'
+                'downloaded': '0 MB',
+                'ttfb': None
             }
             self.last_update_time = time.time()
+            self.job_started_at = time.time()
         
-        print(f"🎯 Starting download with AGGRESSIVE method for: {url}")
+        print(f"🎯 Starting download with AGGRESSIVE method ({self.engine}) for: {url}")
         
         # Langsung pakai AGGRESSIVE method (skip method biasa)
-        success = self._download_with_ytdlp_aggressive(url, quality, format_type, concurrent_fragments)
+        if self.worker_pool:
+            success = self._download_with_worker_pool(url, quality, format_type, concurrent_fragments)
+        else:
+            success = self._download_with_ytdlp_aggressive(url, quality, format_type, concurrent_fragments)
         
         with self.download_lock:
-            if success:
+            if self.download_status['status'] == 'cancelled':
+                print("🛑 FINAL: Download cancelled")
+                return False
+            elif success:
                 self.download_status['status'] = 'completed'
                 self.download_status['progress'] = 100
                 self.download_status['message'] = 'Download completed successfully!'
@@ -251,6 +411,8 @@ class YouTubeDownloader:
                 if match:
                     percent = float(match.group(1))
                     with self.download_lock:
+                        if percent > 0:
+                            self._mark_first_byte()
                         self.download_status['progress'] = percent
                         self.download_status['message'] = f'Downloading: {percent:.1f}%'
             
@@ -279,6 +441,9 @@ class YouTubeDownloader:
                     filename = line.split('Destination:', 1)[1].strip()
                 else:
                     filename = line.split('[Merger]', 1)[1].strip()
+                    match = re.search(r'Merging formats into "(.+)"', filename)
+                    if match:
+                        filename = match.group(1)
                 
                 with self.download_lock:
                     self.download_status['filename'] = os.path.basename(filename)
@@ -334,10 +499,16 @@ class YouTubeDownloader:
             if self.download_status['status'] in ['completed', 'error', 'cancelled', 'idle']:
                 return False
         
-        if self.current_process and self.current_process.poll() is None:
+        with self.download_lock:
+            worker = self.current_worker
+        
+        if worker or (self.current_process and self.current_process.poll() is None):
             try:
                 print("🛑 Cancelling download...")
-                self.current_process.terminate()
+                if worker:
+                    worker.cancel()
+                else:
+                    self.current_process.terminate()
                 
                 with self.download_lock:
                     self.download_status['status'] = 'cancelled'
@@ -357,5 +528,13 @@ class YouTubeDownloader:
         
         return False
 
+def _format_bytes(num):
+    """Format a byte count like yt-dlp does (e.g. 12.34MiB)"""
+    num = float(num)
+    for unit in ['B', 'KiB', 'MiB', 'GiB']:
+        if num < 1024 or unit == 'GiB':
+            return f'{num:.2f}{unit}'
+        num /= 1024
+
 # Global instance
 downloader = YouTubeDownloader()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Zip Stream - ZIP64 archives generated on the fly, without temporary files
+
+Entries are written in stored mode (media is already compressed) with a
+data descriptor after each file, so the CRC is computed while streaming.
+Every entry uses ZIP64 fields, which makes the archive size a pure function
+of the file names and sizes: content_length() is known before the first
+byte is sent.
+"""
+import os
+import time
+import zlib
+import struct
+
+CHUNK_SIZE = 1024 * 1024
+
+# General purpose flags: bit 3 = sizes/CRC in data descriptor, bit 11 = UTF-8 names
+FLAGS = 0x0808
+VERSION = 45  # 4.5: ZIP64
+UNKNOWN_32 = 0xFFFFFFFF
+
+LOCAL_HEADER = struct.Struct('<IHHHHHIIIHH')
+ZIP64_LOCAL_EXTRA = struct.Struct('<HHQQ')
+DATA_DESCRIPTOR = struct.Struct('<IIQQ')
+CENTRAL_HEADER = struct.Struct('<IHHHHHHIIIHHHHHII')
+ZIP64_CENTRAL_EXTRA = struct.Struct('<HHQQQ')
+ZIP64_END = struct.Struct('<IQHHIIQQQQ')
+ZIP64_LOCATOR = struct.Struct('<IIQI')
+END_RECORD = struct.Struct('<IHHHHIIH')
+
+
+class ZipEntry:
+    def __init__(self, path, arcname):
+        stat = os.stat(path)
+        self.path = path
+        self.arcname = arcname.encode('utf-8')
+        self.size = stat.st_size
+        self.dos_time, self.dos_date = _dos_datetime(stat.st_mtime)
+        self.crc = 0
+        self.offset = 0
+
+    @property
+    def local_size(self):
+        return LOCAL_HEADER.size + len(self.arcname) + ZIP64_LOCAL_EXTRA.size + self.size + DATA_DESCRIPTOR.size
+
+    @property
+    def central_size(self):
+        return CENTRAL_HEADER.size + len(self.arcname) + ZIP64_CENTRAL_EXTRA.size
+
+
+class ZipStream:
+    def __init__(self, files):
+        """files: iterable of (path, name inside the archive)"""
+        self.entries = []
+        seen = set()
+        for path, arcname in files:
+            arcname = _unique_name(arcname, seen)
+            self.entries.append(ZipEntry(path, arcname))
+
+    def content_length(self):
+        return (
+            sum(entry.local_size + entry.central_size for entry in self.entries)
+            + ZIP64_END.size + ZIP64_LOCATOR.size + END_RECORD.size
+        )
+
+    def __iter__(self):
+        offset = 0
+        for entry in self.entries:
+            entry.offset = offset
+            yield self._local_header(entry)
+
+            crc = 0
+            remaining = entry.size
+            with open(entry.path, 'rb') as f:
+                while remaining:
+                    chunk = f.read(min(CHUNK_SIZE, remaining))
+                    if not chunk:
+                        # The length was promised up front; a shrunk file cannot be recovered
+                        raise IOError(f'{entry.path} changed size during export')
+                    crc = zlib.crc32(chunk, crc)
+                    remaining -= len(chunk)
+                    yield chunk
+            entry.crc = crc & 0xFFFFFFFF
+
+            yield DATA_DESCRIPTOR.pack(0x08074b50, entry.crc, entry.size, entry.size)
+            offset += entry.local_size
+
+        central_offset = offset
+        central = [self._central_header(entry) for entry in self.entries]
+        central_size = sum(len(record) for record in central)
+        yield b''.join(central)
+
+        count = len(self.entries)
+        zip64_end_offset = central_offset + central_size
+        yield ZIP64_END.pack(
+            0x06064b50, ZIP64_END.size - 12, VERSION, VERSION, 0, 0,
+            count, count, central_size, central_offset
+        )
+        yield ZIP64_LOCATOR.pack(0x07064b50, 0, zip64_end_offset, 1)
+        yield END_RECORD.pack(
+            0x06054b50, 0, 0, min(count, 0xFFFF), min(count, 0xFFFF),
+            min(central_size, UNKNOWN_32), min(central_offset, UNKNOWN_32), 0
+        )
+
+    def _local_header(self, entry):
+        return (
+            LOCAL_HEADER.pack(
+                0x04034b50, VERSION, FLAGS, 0, entry.dos_time, entry.dos_date,
+                0, UNKNOWN_32, UNKNOWN_32, len(entry.arcname), ZIP64_LOCAL_EXTRA.size
+            )
+            + entry.arcname
+            # Sizes follow in the data descriptor
+            + ZIP64_LOCAL_EXTRA.pack(0x0001, 16, 0, 0)
+        )
+
+    def _central_header(self, entry):
+        return (
+            CENTRAL_HEADER.pack(
+                0x02014b50, (3 << 8) | VERSION, VERSION, FLAGS, 0, entry.dos_time, entry.dos_date,
+                entry.crc, UNKNOWN_32, UNKNOWN_32, len(entry.arcname), ZIP64_CENTRAL_EXTRA.size,
+                0, 0, 0, (0o100644 << 16), UNKNOWN_32
+            )
+            + entry.arcname
+            + ZIP64_CENTRAL_EXTRA.pack(0x0001, 24, entry.size, entry.size, entry.offset)
+        )
+
+
+def _dos_datetime(timestamp):
+    t = time.localtime(timestamp)
+    year = min(max(t.tm_year, 1980), 2107)
+    dos_time = (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2)
+    dos_date = ((year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+    return dos_time, dos_date
+
+
+def _unique_name(name, seen):
+    """Avoid duplicate names inside the archive (file.mp4, file (2).mp4, ...)"""
+    candidate = name
+    root, ext = os.path.splitext(name)
+    counter = 2
+    while candidate in seen:
+        candidate = f'{root} ({counter}){ext}'
+        counter += 1
+    seen.add(candidate)
+    return candidate
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Shared helpers for the offline benchmarks: HTTP client, server launch, stats
+"""
+import os
+import sys
+import json
+import time
+import socket
+import subprocess
+import http.client
+from urllib.parse import urlparse
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+STUB_BIN_DIR = os.path.join(BENCH_DIR, 'bin')
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+
+
+class ApiClient:
+    """Minimal JSON client; keeps one connection open when the server allows it"""
+
+    def __init__(self, base_url, timeout=30):
+        parsed = urlparse(base_url)
+        self.host = parsed.hostname
+        self.port = parsed.port
+        self.timeout = timeout
+        self.connection = None
+
+    def request(self, method, path, data=None, headers=None):
+        """Return (status_code, json_body, elapsed_seconds)"""
+        body = json.dumps(data) if data is not None else None
+        request_headers = {'Content-Type': 'application/json'} if body else {}
+        request_headers.update(headers or {})
+
+        for attempt in range(2):
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            started = time.perf_counter()
+            try:
+                self.connection.request(method, path, body=body, headers=request_headers)
+                response = self.connection.getresponse()
+                raw = response.read()
+                elapsed = time.perf_counter() - started
+                if response.getheader('Connection', '').lower() == 'close' or response.version == 10:
+                    self.close()
+                try:
+                    payload = json.loads(raw) if raw else None
+                except ValueError:
+                    payload = None
+                return response.status, payload, elapsed
+            except (http.client.HTTPException, OSError):
+                self.close()
+                if attempt:
+                    raise
+
+    def get(self, path, headers=None):
+        return self.request('GET', path, headers=headers)
+
+    def post(self, path, data=None, headers=None):
+        return self.request('POST', path, data=data, headers=headers)
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_server(base_url, timeout=30, process=None):
+    """Block until /api/health answers"""
+    client = ApiClient(base_url, timeout=2)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f'Server exited with code {process.returncode}')
+        try:
+            status, _, _ = client.get('/api/health')
+            if status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f'Server at {base_url} did not start within {timeout}s')
+
+
+def benchmark_env(home_dir, media_url, engine='subprocess', api_keys=()):
+    """Environment for a server that downloads from the local media server via the stub"""
+    env = dict(os.environ)
+    env.update({
+        'HOME': home_dir,
+        'PATH': STUB_BIN_DIR + os.pathsep + env.get('PATH', ''),
+        'BENCH_MEDIA_URL': media_url,
+        'DOWNLOAD_ENGINE': engine,
+        'API_KEYS': ','.join(api_keys),
+        'PYTHONUNBUFFERED': '1'
+    })
+    return env
+
+
+def start_flask_server(port, env, log_file=None):
+    """Run server.app on Flask's threaded development server"""
+    code = (
+        'import sys; sys.path.insert(0, {root!r}); import server; '
+        'server.app.run(host="127.0.0.1", port={port}, threaded=True, debug=False, use_reloader=False)'
+    ).format(root=ROOT_DIR, port=port)
+    return subprocess.Popen(
+        [sys.executable, '-c', code],
+        cwd=ROOT_DIR,
+        env=env,
+        stdout=log_file or subprocess.DEVNULL,
+        stderr=subprocess.STDOUT
+    )
+
+
+def start_gunicorn_server(port, env, workers=1, threads=4, log_file=None):
+    """Run server:app under gunicorn like the Railway deployment does"""
+    return subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', 'server:app',
+         '--bind', f'127.0.0.1:{port}',
+         f'--workers={workers}', f'--threads={threads}', '--timeout=300'],
+        cwd=ROOT_DIR,
+        env=env,
+        stdout=log_file or subprocess.DEVNULL,
+        stderr=subprocess.STDOUT
+    )
+
+
+def stop_process(process):
+    if process.poll() is None:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+def _child_pids(pid):
+    children = []
+    task_dir = f'/proc/{pid}/task'
+    try:
+        for tid in os.listdir(task_dir):
+            with open(os.path.join(task_dir, tid, 'children')) as f:
+                children.extend(int(child) for child in f.read().split())
+    except OSError:
+        pass
+    return children
+
+
+def _rss_mb(pid):
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+def process_tree_rss_mb(pid):
+    """RSS of a process and all its descendants (Linux /proc only)"""
+    total = 0.0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        total += _rss_mb(current)
+        pending.extend(_child_pids(current))
+    return total
+
+
+def percentile(samples, percent):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(percent / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def latency_summary(samples):
+    """p50/p90/p99/max in milliseconds"""
+    if not samples:
+        return {'count': 0}
+    return {
+        'count': len(samples),
+        'p50_ms': round(percentile(samples, 50) * 1000, 3),
+        'p90_ms': round(percentile(samples, 90) * 1000, 3),
+        'p99_ms': round(percentile(samples, 99) * 1000, 3),
+        'max_ms': round(max(samples) * 1000, 3)
+    }
+
+
+def write_results(results, output_path):
+    directory = os.path.dirname(os.path.abspath(output_path))
+    os.makedirs(directory, exist_ok=True)
+    with open(output_path, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    print(f"📝 Results written to {output_path}")
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Fake yt-dlp - downloads synthetic media from the local media server
+
+Used two ways:
+  * as a stub `yt-dlp` executable (benchmarks/bin/yt-dlp) that prints
+    realistic --newline progress output for the subprocess engine
+  * as FakeWorkerPool, an in-process drop-in for backend.worker_pool.WorkerPool
+    that emits the same structured messages as a prewarmed worker
+
+The media server URL comes from BENCH_MEDIA_URL. Video ids are taken from
+the YouTube URL (v=...), so the server's URL validation still applies.
+"""
+import os
+import re
+import sys
+import json
+import time
+import threading
+import urllib.request
+import urllib.error
+from concurrent.futures import ThreadPoolExecutor
+
+STUB_VERSION = '2024.04.09'
+MEDIA_URL_ENV = 'BENCH_MEDIA_URL'
+
+
+class DownloadCancelled(Exception):
+    pass
+
+
+def _option(args, name, default=None):
+    """Value following a CLI option, e.g. _option(args, '-o')"""
+    for i, arg in enumerate(args[:-1]):
+        if arg == name:
+            return args[i + 1]
+    return default
+
+
+def _target_url(args):
+    # The downloader always appends the video URL last
+    for arg in reversed(args):
+        if arg.startswith('http'):
+            return arg
+    return None
+
+
+def _video_id(url):
+    match = re.search(r'(?:v=|youtu\.be/|shorts/)([0-9A-Za-z_-]{11})', url or '')
+    return match.group(1) if match else 'benchmark00'
+
+
+def format_bytes(num):
+    num = float(num)
+    for unit in ['B', 'KiB', 'MiB', 'GiB']:
+        if num < 1024 or unit == 'GiB':
+            return f'{num:.2f}{unit}'
+        num /= 1024
+
+
+def format_eta(seconds):
+    if seconds is None:
+        return 'Unknown'
+    minutes, seconds = divmod(int(seconds), 60)
+    return f'{minutes:02d}:{seconds:02d}'
+
+
+def format_event(event):
+    """Render a structured event as the line yt-dlp --newline would print"""
+    if event['type'] == 'info':
+        return '\n'.join([
+            f"[youtube] Extracting URL: {event['url']}",
+            f"[youtube] {event['id']}: Downloading webpage",
+            f"[youtube] {event['id']}: Downloading android player API JSON",
+            f"[info] {event['id']}: Downloading 1 format(s): {event['format_id']}",
+            f"[download] Destination: {event['filename']}"
+        ])
+    if event['type'] == 'postprocess':
+        if event['status'] != 'started':
+            return None
+        if event['postprocessor'] == 'Merger':
+            return f'[Merger] Merging formats into "{event["filepath"]}"'
+        return f"[ExtractAudio] Destination: {event['filepath']}"
+
+    total = format_bytes(event['total_bytes'])
+    if event['status'] == 'finished':
+        elapsed = format_eta(event.get('elapsed'))
+        speed = format_bytes(event['speed'] or 0)
+        return f'[download] 100% of {total:>10} in 00:{elapsed} at {speed}/s'
+
+    percent = event['downloaded_bytes'] * 100.0 / event['total_bytes']
+    speed = format_bytes(event['speed']) + '/s' if event['speed'] else 'Unknown B/s'
+    return (f"[download] {percent:5.1f}% of ~{total:>10} at {speed:>12} ETA {format_eta(event['eta'])} "
+            f"(frag {event['fragment_index']}/{event['fragment_count']})")
+
+
+def progress_events(total_bytes, fragment_size, elapsed_per_fragment=0.05, filename='video.mp4'):
+    """Synthetic progress events for a download, without any network I/O"""
+    fragments = max(1, total_bytes // fragment_size)
+    for index in range(fragments + 1):
+        downloaded = index * fragment_size
+        elapsed = max(index, 1) * elapsed_per_fragment
+        speed = downloaded / elapsed if index else None
+        yield {
+            'type': 'progress',
+            'status': 'downloading',
+            'filename': filename,
+            'downloaded_bytes': downloaded,
+            'total_bytes': fragments * fragment_size,
+            'speed': speed,
+            'eta': (fragments - index) * elapsed_per_fragment if index else None,
+            'fragment_index': index,
+            'fragment_count': fragments
+        }
+
+
+class FakeDownload:
+    def __init__(self, args, media_url=None, cancel_event=None):
+        self.args = args
+        self.media_url = (media_url or os.environ.get(MEDIA_URL_ENV, 'http://127.0.0.1:8765')).rstrip('/')
+        self.cancel_event = cancel_event or threading.Event()
+        self.url = _target_url(args)
+        self.video_id = _video_id(self.url)
+        self.audio = '-x' in args
+        self.concurrent_fragments = int(_option(args, '--concurrent-fragments', 1))
+        self.fragment_retries = int(_option(args, '--fragment-retries', 10))
+
+    def _fetch_json(self, path):
+        with urllib.request.urlopen(self.media_url + path, timeout=30) as response:
+            return json.loads(response.read())
+
+    def _fetch_fragment(self, index):
+        for attempt in range(self.fragment_retries + 1):
+            if self.cancel_event.is_set():
+                raise DownloadCancelled()
+            try:
+                url = f'{self.media_url}/frag/{self.video_id}/{index}'
+                with urllib.request.urlopen(url, timeout=30) as response:
+                    return response.read()
+            except urllib.error.HTTPError as e:
+                if attempt == self.fragment_retries:
+                    raise
+                time.sleep(min(0.05 * (attempt + 1), 0.5))
+
+    def metadata(self):
+        """What `yt-dlp -J` reports for the video"""
+        info = self._fetch_json(f'/info/{self.video_id}')
+        return {'id': self.video_id, 'title': info['title'], 'duration': info.get('duration')}
+
+    def run(self, emit):
+        """Download every fragment, calling emit(event) like yt-dlp's hooks"""
+        info = self._fetch_json(f'/info/{self.video_id}')
+        template = _option(self.args, '-o', '%(title)s.%(ext)s')
+        filename = template.replace('%(title)s', info['title']).replace('%(ext)s', info['ext'])
+        os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+
+        fragments = info['fragments']
+        total = fragments * info['fragment_size']
+        emit({'type': 'info', 'url': self.url, 'id': self.video_id,
+              'format_id': '140' if self.audio else '137+140', 'filename': filename})
+
+        started = time.time()
+        downloaded = 0
+        with open(filename, 'wb') as output, \
+                ThreadPoolExecutor(max_workers=self.concurrent_fragments) as pool:
+            for index, data in enumerate(pool.map(self._fetch_fragment, range(fragments)), 1):
+                output.write(data)
+                downloaded += len(data)
+                elapsed = time.time() - started
+                speed = downloaded / elapsed if elapsed > 0 else None
+                emit({
+                    'type': 'progress',
+                    'status': 'downloading',
+                    'filename': filename,
+                    'downloaded_bytes': downloaded,
+                    'total_bytes': total,
+                    'speed': speed,
+                    'eta': (total - downloaded) / speed if speed else None,
+                    'fragment_index': index,
+                    'fragment_count': fragments
+                })
+
+        elapsed = time.time() - started
+        emit({'type': 'progress', 'status': 'finished', 'filename': filename,
+              'downloaded_bytes': total, 'total_bytes': total,
+              'speed': total / elapsed if elapsed > 0 else None, 'eta': 0, 'elapsed': elapsed})
+
+        if self.audio:
+            final = os.path.splitext(filename)[0] + '.' + (_option(self.args, '--audio-format') or 'mp3')
+            processor = 'ExtractAudio'
+        else:
+            final = filename
+            processor = 'Merger'
+        emit({'type': 'postprocess', 'status': 'started', 'postprocessor': processor, 'filepath': final})
+        if final != filename:
+            os.replace(filename, final)
+        emit({'type': 'postprocess', 'status': 'finished', 'postprocessor': processor, 'filepath': final})
+        return 0
+
+
+def main(argv=None):
+    """Entry point of the stub yt-dlp executable"""
+    args = list(sys.argv[1:] if argv is None else argv)
+
+    if '--version' in args:
+        print(STUB_VERSION)
+        return 0
+    if '--cookies-from-browser' in args:
+        browser = _option(args, '--cookies-from-browser')
+        print(f'ERROR: could not find {browser} cookies database', file=sys.stderr)
+        return 1
+    if '--simulate' in args:
+        return 0
+    if '-J' in args:
+        try:
+            print(json.dumps(FakeDownload(args).metadata()))
+            return 0
+        except Exception as e:
+            print(f'ERROR: {e}', file=sys.stderr)
+            return 1
+
+    def emit(event):
+        line = format_event(event)
+        if line:
+            print(line, flush=True)
+
+    try:
+        return FakeDownload(args).run(emit)
+    except Exception as e:
+        print(f'ERROR: {e}', flush=True)
+        return 1
+
+
+class FakeWorker:
+    def __init__(self, pid):
+        self.pid = pid
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+
+class FakeWorkerPool:
+    """In-process stand-in for WorkerPool with the same message protocol"""
+
+    def __init__(self, media_url, size=2):
+        self.media_url = media_url
+        self.size = size
+        self.jobs_done = 0
+        self.lock = threading.Lock()
+        self.version_string = STUB_VERSION + ' (fake)'
+
+    def start(self):
+        pass
+
+    def version(self, timeout=10):
+        return self.version_string
+
+    def run(self, args, on_message=None, timeout=None, quiet=False, on_start=None):
+        if '--simulate' in args:
+            return 0
+
+        with self.lock:
+            self.jobs_done += 1
+            worker = FakeWorker(self.jobs_done)
+        if on_start:
+            on_start(worker)
+
+        def emit(event):
+            if on_message and event['type'] in ('progress', 'postprocess'):
+                on_message(event)
+
+        try:
+            return FakeDownload(args, self.media_url, worker.cancel_event).run(emit)
+        except DownloadCancelled:
+            return 1
+        except Exception as e:
+            print(f"⚠️ Fake worker job error: {e}")
+            return 1
+
+    def extract(self, args, timeout=None):
+        try:
+            return FakeDownload(args, self.media_url).metadata()
+        except Exception as e:
+            print(f"⚠️ Fake worker probe error: {e}")
+            return None
+
+    def get_stats(self):
+        return {'size': self.size, 'idle': self.size, 'recycled': 0, 'jobs': self.jobs_done}
+
+
+if __name__ == '__main__':
+    sys.exit(main())
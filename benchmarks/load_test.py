@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+HTTP API load test - finds which lock limits throughput as concurrency grows
+
+Runs server:app under gunicorn with the stub yt-dlp and LOCK_PROFILING=1,
+then for each concurrency level simulates that many clients issuing a mix
+of /api/status, /api/is-busy, /api/download and /api/cancel. Every level
+gets a fresh server, so jobs queued by one level do not leak into the next.
+Per level it records per-endpoint latency histograms and the wait/hold
+times of scheduler.lock and downloader.download_lock (via /api/debug/locks).
+
+    python benchmarks/load_test.py --concurrency 50,100,200,400 --duration 20
+"""
+import os
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+import platform
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import (
+    RESULTS_DIR, ApiClient, benchmark_env, free_port, latency_summary,
+    start_gunicorn_server, stop_process, wait_for_server, write_results
+)
+from media_server import MediaServer
+
+# Upper bounds of latency histogram buckets, in milliseconds
+BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+
+ENDPOINTS = ['status', 'is-busy', 'download', 'cancel']
+
+# Wait time, as a fraction of wall time, below which a lock is not a bottleneck
+LOCK_WAIT_THRESHOLD = 0.01
+
+
+def histogram(samples):
+    counts = [0] * (len(BUCKETS_MS) + 1)
+    for value in samples:
+        ms = value * 1000
+        for i, bound in enumerate(BUCKETS_MS):
+            if ms <= bound:
+                counts[i] += 1
+                break
+        else:
+            counts[-1] += 1
+    labels = [f'<={bound}ms' for bound in BUCKETS_MS] + [f'>{BUCKETS_MS[-1]}ms']
+    return dict(zip(labels, counts))
+
+
+class VirtualClient(threading.Thread):
+    def __init__(self, index, base_url, weights, options, stop_event, seed):
+        super().__init__(daemon=True)
+        self.client = ApiClient(base_url)
+        self.headers = {'X-API-Key': f'load-client-{index}'}
+        self.index = index
+        self.weights = weights
+        self.options = options
+        self.stop_event = stop_event
+        self.random = random.Random(seed)
+        self.outstanding = []
+        self.latencies = {endpoint: [] for endpoint in ENDPOINTS}
+        self.errors = {endpoint: 0 for endpoint in ENDPOINTS}
+        self.submitted = 0
+
+    def _call(self, endpoint):
+        if endpoint == 'status':
+            return self.client.get('/api/status')
+        if endpoint == 'is-busy':
+            return self.client.get('/api/is-busy')
+        if endpoint == 'download':
+            self.submitted += 1
+            response = self.client.post('/api/download', {
+                'url': f'https://www.youtube.com/watch?v=L{self.index:04d}{self.submitted:06d}',
+                'format': 'audio' if self.random.random() < 0.3 else 'video',
+                'concurrent_fragments': 2
+            }, headers=self.headers)
+            if response[0] == 202 and response[1]:
+                self.outstanding.append(response[1]['job_id'])
+            return response
+        # Cancel our oldest outstanding job
+        return self.client.post('/api/cancel', {'job_id': self.outstanding.pop(0)}, headers=self.headers)
+
+    def run(self):
+        endpoints, weights = zip(*self.weights.items())
+        # Spread start-up so clients do not fire in lockstep
+        self.stop_event.wait(self.random.random() * self.options.think_time)
+        while not self.stop_event.is_set():
+            endpoint = self.random.choices(endpoints, weights)[0]
+            if endpoint == 'download' and len(self.outstanding) >= self.options.max_outstanding:
+                endpoint = 'cancel'
+            # Only our own jobs are cancelled; with none outstanding, skip the request
+            if endpoint != 'cancel' or self.outstanding:
+                try:
+                    status, _, elapsed = self._call(endpoint)
+                    if status < 500:
+                        self.latencies[endpoint].append(elapsed)
+                    else:
+                        self.errors[endpoint] += 1
+                except OSError:
+                    self.errors[endpoint] += 1
+            if self.options.think_time:
+                self.stop_event.wait(self.random.expovariate(1.0 / self.options.think_time))
+        self.client.close()
+
+
+def run_level(base_url, concurrency, weights, options):
+    control = ApiClient(base_url)
+    control.post('/api/debug/locks/reset')
+
+    stop_event = threading.Event()
+    clients = [VirtualClient(i, base_url, weights, options, stop_event, options.seed + i)
+               for i in range(concurrency)]
+    started = time.time()
+    for client in clients:
+        client.start()
+    stop_event.wait(options.duration)
+    stop_event.set()
+    for client in clients:
+        client.join(timeout=30)
+    elapsed = time.time() - started
+
+    _, locks, _ = control.get('/api/debug/locks')
+    _, queue, _ = control.get('/api/queue')
+
+    endpoints = {}
+    total = 0
+    for endpoint in ENDPOINTS:
+        samples = [value for client in clients for value in client.latencies[endpoint]]
+        total += len(samples)
+        endpoints[endpoint] = dict(
+            latency_summary(samples),
+            errors=sum(client.errors[endpoint] for client in clients),
+            requests_per_second=round(len(samples) / elapsed, 2),
+            histogram=histogram(samples)
+        )
+
+    lock_stats = (locks or {}).get('locks', {})
+    limiting = max(lock_stats, key=lambda name: lock_stats[name]['wait_ratio'], default=None)
+    return {
+        'concurrency': concurrency,
+        'elapsed_s': round(elapsed, 3),
+        'requests_per_second': round(total / elapsed, 2),
+        'endpoints': endpoints,
+        'locks': lock_stats,
+        'limiting_lock': limiting,
+        'queued_jobs_at_end': queue['queued'] if queue else None
+    }
+
+
+def start_server(env, options, log_file):
+    """Fresh gunicorn server with lock profiling on; returns (process, base_url)"""
+    port = free_port()
+    base_url = f'http://127.0.0.1:{port}'
+    process = start_gunicorn_server(port, env, workers=1, threads=options.threads, log_file=log_file)
+    try:
+        wait_for_server(base_url, process=process)
+        _, locks, _ = ApiClient(base_url).get('/api/debug/locks')
+        if not locks or not locks.get('enabled'):
+            raise RuntimeError('Lock profiling is not enabled on the server')
+    except Exception:
+        stop_process(process)
+        raise
+    return process, base_url
+
+
+def run_load_test(options):
+    weights = {
+        'status': options.status_weight,
+        'is-busy': options.busy_weight,
+        'download': options.download_weight,
+        'cancel': options.cancel_weight
+    }
+    home_dir = tempfile.mkdtemp(prefix='ytdl-load-')
+    media = MediaServer(size_mb=options.size_mb, fragment_kb=options.fragment_kb,
+                        speed=options.speed, seed=options.seed).start()
+
+    api_keys = [f'load-client-{i}' for i in range(max(options.concurrency))]
+    env = benchmark_env(home_dir, media.url, 'subprocess', api_keys)
+    env['LOCK_PROFILING'] = '1'
+    log_file = open(os.path.join(home_dir, 'server.log'), 'w')
+
+    try:
+        levels = []
+        for concurrency in options.concurrency:
+            # A new server per level: queued jobs and lock stats start from zero
+            process, base_url = start_server(env, options, log_file)
+            print(f"🚀 gunicorn ready on {base_url} ({options.threads} threads)")
+            print(f"👥 {concurrency} clients for {options.duration}s...")
+            try:
+                level = run_level(base_url, concurrency, weights, options)
+            finally:
+                stop_process(process)
+            levels.append(level)
+            status = level['endpoints']['status']
+            lock_line = ', '.join(
+                f"{name} util {stats['utilization']:.1%} wait {stats['wait_ratio']:.1%}"
+                for name, stats in sorted(level['locks'].items())
+            )
+            print(f"   {level['requests_per_second']} req/s, status p99 {status.get('p99_ms')} ms; {lock_line}")
+
+        return {
+            'config': dict(vars(options), weights=weights),
+            'platform': {'python': platform.python_version(), 'machine': platform.machine(),
+                         'cpus': os.cpu_count()},
+            'levels': levels,
+            'summary': summarize(levels)
+        }
+    finally:
+        log_file.close()
+        media.stop()
+        shutil.rmtree(home_dir, ignore_errors=True)
+
+
+def summarize(levels):
+    """Which lock's wait share grows with concurrency, and where throughput stops scaling"""
+    if not levels:
+        return {}
+    first, last = levels[0], levels[-1]
+    growth = {}
+    for name, stats in last['locks'].items():
+        before = first['locks'].get(name, {}).get('wait_ratio', 0)
+        growth[name] = round(stats['wait_ratio'] - before, 4)
+
+    peak = max(levels, key=lambda level: level['requests_per_second'])
+    limiting = max(growth, key=growth.get) if growth else None
+    # A lock nobody waits on noticeably is not what limits throughput
+    if limiting and last['locks'][limiting]['wait_ratio'] < LOCK_WAIT_THRESHOLD:
+        limiting = None
+    return {
+        'peak_requests_per_second': peak['requests_per_second'],
+        'peak_concurrency': peak['concurrency'],
+        'wait_ratio_growth': growth,
+        'limiting_lock': limiting,
+        'bottleneck': limiting or 'request handling (no lock waited on for >= 1% of wall time)'
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Load test the HTTP API and profile lock contention')
+    parser.add_argument('--concurrency', default='25,50,100,200',
+                        type=lambda value: [int(part) for part in value.split(',')])
+    parser.add_argument('--duration', type=float, default=15, help='seconds per concurrency level')
+    parser.add_argument('--threads', type=int, default=4, help='gunicorn threads (Railway uses 4)')
+    parser.add_argument('--think-time', type=float, default=0.1, help='mean pause between requests per client')
+    parser.add_argument('--status-weight', type=float, default=80)
+    parser.add_argument('--busy-weight', type=float, default=12)
+    parser.add_argument('--download-weight', type=float, default=5)
+    parser.add_argument('--cancel-weight', type=float, default=3)
+    parser.add_argument('--max-outstanding', type=int, default=2, help='queued jobs per client')
+    parser.add_argument('--size-mb', type=float, default=0.5)
+    parser.add_argument('--fragment-kb', type=int, default=64)
+    parser.add_argument('--speed', type=int, default=2 * 1024 * 1024, help='media server bytes/s per connection')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', default=os.path.join(RESULTS_DIR, 'load_test.json'))
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    options = parse_args()
+    results = run_load_test(options)
+    write_results(results, options.output)
+    summary = results['summary']
+    print(f"⚡ Peak {summary['peak_requests_per_second']} req/s at {summary['peak_concurrency']} clients; "
+          f"bottleneck: {summary['bottleneck']}")
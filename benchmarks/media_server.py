@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Local media server - serves synthetic fragmented media for offline benchmarks
+
+    GET /info/<video_id>        -> {"title", "duration", "fragments", "fragment_size", "ext"}
+    GET /frag/<video_id>/<n>    -> fragment n (deterministic bytes)
+
+Speed is a per-connection throttle in bytes/s (0 = unlimited); error_rate is
+the probability that a fragment request fails with 503.
+"""
+import json
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CHUNK_SIZE = 16 * 1024
+
+
+class MediaServer:
+    def __init__(self, host='127.0.0.1', port=0, size_mb=8, fragment_kb=512,
+                 speed=0, error_rate=0.0, seed=None):
+        self.size_mb = size_mb
+        self.fragment_size = fragment_kb * 1024
+        self.speed = speed
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.random_lock = threading.Lock()
+        self.stats = {'fragments': 0, 'errors': 0, 'bytes': 0}
+        self.stats_lock = threading.Lock()
+        # One fragment's worth of payload, reused for every response
+        self.payload = bytes(range(256)) * (self.fragment_size // 256 + 1)
+
+        handler = self._make_handler()
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def fragments(self):
+        return max(1, int(self.size_mb * 1024 * 1024) // self.fragment_size)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _should_fail(self):
+        if not self.error_rate:
+            return False
+        with self.random_lock:
+            return self.random.random() < self.error_rate
+
+    def _count(self, key, amount=1):
+        with self.stats_lock:
+            self.stats[key] += amount
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, data, code=200):
+                body = json.dumps(data).encode()
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                parts = self.path.strip('/').split('/')
+                if len(parts) == 2 and parts[0] == 'info':
+                    self._send_json({
+                        'id': parts[1],
+                        'title': f'Benchmark Video {parts[1]}',
+                        # Deterministic mix of short and long videos (1-20 minutes)
+                        'duration': 60 + zlib.crc32(parts[1].encode()) % 1140,
+                        'fragments': server.fragments,
+                        'fragment_size': server.fragment_size,
+                        'ext': 'mp4'
+                    })
+                elif len(parts) == 3 and parts[0] == 'frag':
+                    self._send_fragment()
+                else:
+                    self._send_json({'error': 'Not found'}, 404)
+
+            def _send_fragment(self):
+                if server._should_fail():
+                    server._count('errors')
+                    self._send_json({'error': 'Service unavailable'}, 503)
+                    return
+
+                self.send_response(200)
+                self.send_header('Content-Type', 'video/mp4')
+                self.send_header('Content-Length', str(server.fragment_size))
+                self.end_headers()
+
+                started = time.time()
+                sent = 0
+                while sent < server.fragment_size:
+                    chunk = server.payload[sent:min(sent + CHUNK_SIZE, server.fragment_size)]
+                    self.wfile.write(chunk)
+                    sent += len(chunk)
+                    if server.speed:
+                        # Sleep until we are back under the configured rate
+                        ahead = sent / server.speed - (time.time() - started)
+                        if ahead > 0:
+                            time.sleep(ahead)
+
+                server._count('fragments')
+                server._count('bytes', sent)
+
+        return Handler
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Serve synthetic fragmented media')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--size-mb', type=float, default=8)
+    parser.add_argument('--fragment-kb', type=int, default=512)
+    parser.add_argument('--speed', type=int, default=0, help='bytes/s per connection, 0 = unlimited')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    options = parser.parse_args()
+
+    media = MediaServer(port=options.port, size_mb=options.size_mb, fragment_kb=options.fragment_kb,
+                        speed=options.speed, error_rate=options.error_rate)
+    print(f"🎞️ Media server on {media.url} ({media.fragments} fragments per video)")
+    try:
+        media.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Offline end-to-end benchmark - drives server.py through its HTTP API
+
+No network access is needed: downloads come from a local media server,
+either through the stub yt-dlp executable (--engine subprocess, server in a
+child process) or the in-process FakeWorkerPool (--engine fake).
+
+Reports jobs/minute, /api/status p50/p99, parser CPU per MB and memory per
+active job, and writes everything as JSON:
+
+    python benchmarks/run_benchmarks.py --jobs 20 --size-mb 4 --output benchmarks/results/latest.json
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+import platform
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import (
+    ROOT_DIR, RESULTS_DIR, ApiClient, benchmark_env, free_port, latency_summary,
+    process_tree_rss_mb, start_flask_server, stop_process, wait_for_server, write_results
+)
+from fake_ytdlp import FakeWorkerPool, format_event, progress_events
+from media_server import MediaServer
+
+
+def measure_parser_cpu(size_mb=64, fragment_kb=64):
+    """CPU seconds per MB spent turning progress into status, for both engines"""
+    sys.path.insert(0, os.path.join(ROOT_DIR, 'backend'))
+    from yt_downloader import YouTubeDownloader
+
+    total_bytes = int(size_mb * 1024 * 1024)
+    events = list(progress_events(total_bytes, fragment_kb * 1024))
+    lines = [format_event(event) for event in events]
+
+    target = YouTubeDownloader()
+
+    started = time.process_time()
+    for line in lines:
+        target._parse_line(line)
+    line_cpu = time.process_time() - started
+
+    started = time.process_time()
+    for event in events:
+        target._apply_progress(event)
+    message_cpu = time.process_time() - started
+
+    return {
+        'size_mb': size_mb,
+        'updates': len(events),
+        'updates_per_mb': round(len(events) / size_mb, 2),
+        'line_parser_cpu_ms_per_mb': round(line_cpu * 1000 / size_mb, 4),
+        'structured_cpu_ms_per_mb': round(message_cpu * 1000 / size_mb, 4)
+    }
+
+
+class InProcessServer:
+    """server.app on a werkzeug server thread, with the fake engine swapped in"""
+
+    def __init__(self, port, media_url, home_dir, api_keys):
+        os.environ['HOME'] = home_dir
+        os.environ['API_KEYS'] = ','.join(api_keys)
+        # Keep server import from spawning real yt-dlp workers
+        os.environ['DOWNLOAD_ENGINE'] = 'subprocess'
+        sys.path.insert(0, ROOT_DIR)
+        import server
+        from werkzeug.serving import make_server
+
+        server.downloader.worker_pool = FakeWorkerPool(media_url)
+        server.downloader.engine = 'fake'
+        self.httpd = make_server('127.0.0.1', port, server.app, threaded=True)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.pid = os.getpid()
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.httpd.shutdown()
+
+
+class StatusPoller(threading.Thread):
+    def __init__(self, base_url, interval, stop_event):
+        super().__init__(daemon=True)
+        self.client = ApiClient(base_url)
+        self.interval = interval
+        self.stop_event = stop_event
+        self.latencies = []
+        self.errors = 0
+
+    def run(self):
+        while not self.stop_event.is_set():
+            try:
+                status, _, elapsed = self.client.get('/api/status')
+                if status == 200:
+                    self.latencies.append(elapsed)
+                else:
+                    self.errors += 1
+            except OSError:
+                self.errors += 1
+            self.stop_event.wait(self.interval)
+
+
+class MemorySampler(threading.Thread):
+    """Samples process-tree RSS together with the number of active jobs"""
+
+    def __init__(self, pid, base_url, interval, stop_event):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.client = ApiClient(base_url)
+        self.interval = interval
+        self.stop_event = stop_event
+        self.samples = []
+
+    def run(self):
+        while not self.stop_event.is_set():
+            try:
+                _, queue, _ = self.client.get('/api/queue')
+                active = len(queue['active']) if queue else 0
+            except OSError:
+                active = 0
+            self.samples.append((process_tree_rss_mb(self.pid), active))
+            self.stop_event.wait(self.interval)
+
+
+def run_benchmark(options):
+    home_dir = tempfile.mkdtemp(prefix='ytdl-bench-')
+    media = MediaServer(size_mb=options.size_mb, fragment_kb=options.fragment_kb,
+                        speed=options.speed, error_rate=options.error_rate, seed=options.seed).start()
+    port = free_port()
+    base_url = f'http://127.0.0.1:{port}'
+    process = None
+    in_process = None
+    api_keys = [f'bench-client-{i}' for i in range(options.clients)]
+
+    print(f"🎞️ Media server: {media.url} ({media.fragments} x {options.fragment_kb} KiB per video)")
+    try:
+        if options.engine == 'fake':
+            in_process = InProcessServer(port, media.url, home_dir, api_keys)
+            in_process.start()
+            server_pid = in_process.pid
+        else:
+            log_file = open(os.path.join(home_dir, 'server.log'), 'w')
+            process = start_flask_server(port, benchmark_env(home_dir, media.url, 'subprocess', api_keys), log_file)
+            server_pid = process.pid
+        wait_for_server(base_url, process=process)
+        print(f"🚀 Server ready on {base_url} (engine: {options.engine})")
+
+        client = ApiClient(base_url)
+        baseline_rss = process_tree_rss_mb(server_pid)
+
+        stop_event = threading.Event()
+        pollers = [StatusPoller(base_url, options.poll_interval, stop_event) for _ in range(options.status_pollers)]
+        sampler = MemorySampler(server_pid, base_url, 0.2, stop_event)
+        for thread in pollers + [sampler]:
+            thread.start()
+
+        started = time.time()
+        job_ids = []
+        job_keys = {}
+        for i in range(options.jobs):
+            audio = options.audio_every and i % options.audio_every == 0
+            status, body, _ = client.post('/api/download', {
+                'url': f'https://www.youtube.com/watch?v=bench{i:06d}',
+                'format': 'audio' if audio else 'video',
+                'concurrent_fragments': options.concurrent_fragments
+            }, headers={'X-API-Key': api_keys[i % options.clients]})
+            if status != 202:
+                raise RuntimeError(f'Submit failed ({status}): {body}')
+            job_ids.append(body['job_id'])
+            job_keys[body['job_id']] = api_keys[i % options.clients]
+
+        deadline = started + options.timeout
+        results = {}
+        while time.time() < deadline:
+            pending = [job_id for job_id in job_ids if job_id not in results]
+            for job_id in pending:
+                _, job, _ = client.get(f'/api/jobs/{job_id}', headers={'X-API-Key': job_keys[job_id]})
+                if job and job['status'] not in ('queued', 'running'):
+                    results[job_id] = job
+            if len(results) == len(job_ids):
+                break
+            time.sleep(0.2)
+        elapsed = time.time() - started
+
+        stop_event.set()
+        for thread in pollers + [sampler]:
+            thread.join(timeout=5)
+
+        completed = sum(1 for job in results.values() if job['status'] == 'completed')
+        latencies = [value for poller in pollers for value in poller.latencies]
+        active_samples = [(rss, active) for rss, active in sampler.samples if active]
+        peak_rss = max((rss for rss, _ in sampler.samples), default=baseline_rss)
+        per_job = None
+        if active_samples:
+            per_job = sum((rss - baseline_rss) / active for rss, active in active_samples) / len(active_samples)
+        _, queue, _ = client.get('/api/queue')
+
+        return {
+            'config': vars(options),
+            'platform': {'python': platform.python_version(), 'machine': platform.machine()},
+            'jobs': {
+                'submitted': len(job_ids),
+                'completed': completed,
+                'failed': len(results) - completed,
+                'unfinished': len(job_ids) - len(results),
+                'elapsed_s': round(elapsed, 3),
+                'jobs_per_minute': round(completed * 60.0 / elapsed, 2) if elapsed else None,
+                'mb_per_second': round(completed * media.fragments * media.fragment_size
+                                       / (1024 * 1024) / elapsed, 2) if elapsed else None
+            },
+            'status_latency': dict(latency_summary(latencies),
+                                   errors=sum(poller.errors for poller in pollers)),
+            'memory': {
+                'scope': 'benchmark process' if in_process else 'server process tree',
+                'baseline_mb': round(baseline_rss, 2),
+                'peak_mb': round(peak_rss, 2),
+                'per_active_job_mb': round(per_job, 2) if per_job is not None else None
+            },
+            'parser_cpu': measure_parser_cpu(),
+            'queue': queue['lanes'] if queue else None,
+            'media_server': dict(media.stats)
+        }
+    finally:
+        if process is not None:
+            stop_process(process)
+        if in_process is not None:
+            in_process.stop()
+        media.stop()
+        if not options.keep_files:
+            shutil.rmtree(home_dir, ignore_errors=True)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Offline end-to-end benchmark for YouTube Downloader Pro')
+    parser.add_argument('--engine', choices=['subprocess', 'fake'], default='subprocess',
+                        help='subprocess: stub yt-dlp executable; fake: in-process worker pool')
+    parser.add_argument('--jobs', type=int, default=20)
+    parser.add_argument('--clients', type=int, default=4, help='distinct X-API-Key values')
+    parser.add_argument('--audio-every', type=int, default=4, help='every Nth job is audio (0 = none)')
+    parser.add_argument('--size-mb', type=float, default=4)
+    parser.add_argument('--fragment-kb', type=int, default=256)
+    parser.add_argument('--concurrent-fragments', type=int, default=5)
+    parser.add_argument('--speed', type=int, default=0, help='media server bytes/s per connection')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of fragment requests failing')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--status-pollers', type=int, default=4)
+    parser.add_argument('--poll-interval', type=float, default=0.05)
+    parser.add_argument('--timeout', type=float, default=600)
+    parser.add_argument('--keep-files', action='store_true')
+    parser.add_argument('--output', default=os.path.join(RESULTS_DIR, 'latest.json'))
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    options = parse_args()
+    results = run_benchmark(options)
+    write_results(results, options.output)
+    print(f"⚡ {results['jobs']['jobs_per_minute']} jobs/min, "
+          f"status p50 {results['status_latency'].get('p50_ms')} ms / p99 {results['status_latency'].get('p99_ms')} ms, "
+          f"{results['memory']['per_active_job_mb']} MB per active job")
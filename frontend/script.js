@@ -6,6 +6,7 @@ class YouTubeDownloaderUI {
     constructor() {
         this.isDownloading = false;
         this.statusInterval = null;
+        this.currentJobId = null;
         this.initElements();
         this.bindEvents();
         this.checkCookies();
@@ -96,9 +97,10 @@ class YouTubeDownloaderUI {
         try {
             const response = await fetch('/api/is-busy');
             const data = await response.json();
-            if (data.busy) {
-                this.showNotification('Server sedang sibuk, tunggu sampai selesai', 'warning');
-                this.startStatusPolling();
+            if (data.busy && data.job_id) {
+                // Lanjutkan memantau job milik kita sendiri (mis. setelah reload halaman)
+                this.showNotification('Download Anda masih berjalan', 'info');
+                this.resumeJob(data.job_id);
             }
         } catch (error) {
             console.error('Error checking server status:', error);
@@ -110,14 +112,10 @@ class YouTubeDownloaderUI {
             try {
                 const response = await fetch('/api/is-busy');
                 const data = await response.json();
-                if (data.busy && !this.isDownloading) {
-                    // Jika server busy tapi UI tidak menunjukkan downloading
-                    this.showNotification('Server sedang memproses download...', 'info');
-                    this.isDownloading = true;
-                    this.elements.downloadBtn.disabled = true;
-                    this.elements.cancelBtn.disabled = false;
-                    this.elements.progressContainer.style.display = 'block';
-                    this.startStatusPolling();
+                if (data.busy && data.job_id && !this.isDownloading) {
+                    // Job kita sedang diproses tapi UI tidak menunjukkan downloading
+                    this.showNotification('Server sedang memproses download Anda...', 'info');
+                    this.resumeJob(data.job_id);
                 }
             } catch (error) {
                 console.error('Error checking server status:', error);
@@ -125,6 +123,15 @@ class YouTubeDownloaderUI {
         }
     }
 
+    resumeJob(jobId) {
+        this.currentJobId = jobId;
+        this.isDownloading = true;
+        this.elements.downloadBtn.disabled = true;
+        this.elements.cancelBtn.disabled = false;
+        this.elements.progressContainer.style.display = 'block';
+        this.startStatusPolling();
+    }
+
     async startDownload() {
         const url = this.elements.urlInput.value.trim();
         
@@ -133,20 +140,6 @@ class YouTubeDownloaderUI {
             return;
         }
 
-        // PERBAIKAN: Cek status server dulu
-        try {
-            const busyResponse = await fetch('/api/is-busy');
-            const busyData = await busyResponse.json();
-            if (busyData.busy) {
-                this.showNotification('Server sedang sibuk, tunggu sampai selesai', 'warning');
-                return;
-            }
-        } catch (error) {
-            console.error('Error checking server busy:', error);
-            this.showNotification('Gagal menghubungi server', 'error');
-            return;
-        }
-
         // PERBAIKAN: Cek apakah sudah downloading
         if (this.isDownloading) {
             this.showNotification('Download sedang berjalan, tunggu atau batalkan dulu', 'warning');
@@ -192,7 +185,13 @@ class YouTubeDownloaderUI {
                 throw new Error(data.error || 'Gagal memulai download');
             }
 
-            this.showNotification('Download dimulai!', 'success');
+            // Server mengantrikan job; pantau job ini, bukan status global
+            this.currentJobId = data.job_id;
+            if (data.position > 0) {
+                this.showNotification(`Masuk antrian (posisi ${data.position})`, 'info');
+            } else {
+                this.showNotification('Download dimulai!', 'success');
+            }
             this.startStatusPolling();
 
         } catch (error) {
@@ -205,41 +204,61 @@ class YouTubeDownloaderUI {
         if (this.statusInterval) clearInterval(this.statusInterval);
 
         this.statusInterval = setInterval(async () => {
-            if (!this.isDownloading) {
+            if (!this.isDownloading || !this.currentJobId) {
                 clearInterval(this.statusInterval);
                 return;
             }
 
             try {
-                const response = await fetch('/api/status');
-                const status = await response.json();
+                const jobResponse = await fetch(`/api/jobs/${this.currentJobId}`);
+                const job = await jobResponse.json();
 
-                this.updateProgress(status);
+                if (!jobResponse.ok) {
+                    this.showNotification('Job tidak ditemukan', 'error');
+                    clearInterval(this.statusInterval);
+                    setTimeout(() => this.resetUI(), 2000);
+                    return;
+                }
 
-                if (status.status === 'completed') {
+                if (job.status === 'expanding' || job.status === 'queued') {
+                    const message = job.status === 'expanding'
+                        ? 'Membaca daftar video playlist...'
+                        : `Menunggu antrian (posisi ${job.position + 1})...`;
+                    this.elements.progressMessage.textContent = message;
+                    this.updateStatus(message, 'starting');
+                    this.updateFileStatus('Menunggu');
+                }
+                else if (job.status === 'running') {
+                    // Job kita yang sedang berjalan, jadi status global adalah milik kita
+                    const response = await fetch('/api/status');
+                    const status = await response.json();
+                    if (status.status === 'starting' || status.status === 'downloading') {
+                        this.updateProgress(status);
+                    }
+                    if (job.playlist) {
+                        const done = job.playlist.completed + job.playlist.failed;
+                        this.updateFileStatus(`Playlist ${done}/${job.playlist.items}`);
+                    }
+                }
+                else if (job.status === 'completed') {
+                    this.updateProgress({ status: 'completed', progress: 100, message: 'Download selesai!' });
                     this.showNotification('Download selesai! ✅', 'success');
                     this.updateFileStatus('Selesai');
                     clearInterval(this.statusInterval);
                     setTimeout(() => this.resetUI(), 5000);
                 } 
-                else if (status.status === 'error') {
-                    this.showNotification(`Gagal: ${status.error_message || status.message}`, 'error');
+                else if (job.status === 'error') {
+                    this.showNotification(`Gagal: ${job.error || 'download tidak berhasil'}`, 'error');
                     this.updateFileStatus('Gagal');
                     clearInterval(this.statusInterval);
                     setTimeout(() => this.resetUI(), 3000);
                 }
-                else if (status.status === 'cancelled') {
+                else if (job.status === 'cancelled') {
                     this.showNotification('Download dibatalkan', 'warning');
                     this.updateFileStatus('Dibatalkan');
                     clearInterval(this.statusInterval);
                     setTimeout(() => this.resetUI(), 2000);
                 }
-                else if (status.status === 'idle') {
-                    // Jika status idle tapi UI masih menunjukkan downloading
-                    this.showNotification('Download selesai', 'info');
-                    clearInterval(this.statusInterval);
-                    setTimeout(() => this.resetUI(), 2000);
-                }
 
             } catch (error) {
                 console.error('Error fetching status:', error);
@@ -375,7 +394,8 @@ class YouTubeDownloaderUI {
         try {
             const response = await fetch('/api/cancel', { 
                 method: 'POST',
-                headers: { 'Content-Type': 'application/json' }
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ job_id: this.currentJobId })
             });
             
             const data = await response.json();
@@ -397,6 +417,7 @@ class YouTubeDownloaderUI {
 
     resetUI() {
         this.isDownloading = false;
+        this.currentJobId = null;
         this.elements.downloadBtn.disabled = false;
         this.elements.cancelBtn.disabled = true;
         this.elements.progressContainer.style.display = 'none';
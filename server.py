@@ -2,9 +2,9 @@
 """
 YouTube Downloader Pro - Main Server
 """
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify, send_from_directory
 from flask_cors import CORS
-import threading
+from werkzeug.middleware.proxy_fix import ProxyFix
 import os
 import sys
 import time
@@ -17,6 +17,10 @@ sys.path.append(backend_dir)
 
 try:
     from yt_downloader import downloader
+    from scheduler import DownloadScheduler, QueueFullError
+    import lock_profiler
+    from static_cache import StaticAssetCache, negotiate_encoding
+    from zip_stream import ZipStream
     print("✅ Backend module loaded successfully")
 except ImportError as e:
     print(f"❌ Error importing backend module: {e}")
@@ -30,9 +34,29 @@ except ImportError as e:
 app = Flask(__name__, static_folder='frontend')
 CORS(app)  # Enable CORS for all routes
 
+# Number of reverse proxies in front of the app (Railway: 1). Only the entries
+# those proxies appended to X-Forwarded-For are trusted; 0 uses the socket address
+PROXY_HOPS = int(os.environ.get('PROXY_HOPS', 0))
+if PROXY_HOPS:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=PROXY_HOPS)
+
+# Comma-separated API keys that identify a client; unknown keys are ignored
+API_KEYS = {key.strip() for key in os.environ.get('API_KEYS', '').split(',') if key.strip()}
+
 # Download management
-download_active = False
-download_lock = threading.Lock()
+scheduler = DownloadScheduler(downloader)
+scheduler.start()
+
+# Prewarm yt-dlp worker processes so the first download skips interpreter startup
+if downloader.worker_pool:
+    downloader.worker_pool.start()
+
+def get_client_id():
+    """Identify the client by a configured API key, falling back to its IP address"""
+    api_key = request.headers.get('X-API-Key')
+    if api_key and api_key in API_KEYS:
+        return f'key:{api_key}'
+    return f'ip:{request.remote_addr}'
 
 def ensure_directories():
     """Create required directories if they don't exist"""
@@ -45,37 +69,58 @@ def ensure_directories():
     print(f"📂 Frontend directory: {frontend_dir}")
     print(f"📂 Downloads directory: {downloads_dir}")
 
+# Frontend assets are fingerprinted and precompressed once at startup;
+# set FRONTEND_CACHE=0 to serve files straight from disk while editing them
+frontend_dir = os.path.join(current_dir, 'frontend')
+static_cache = StaticAssetCache()
+if os.environ.get('FRONTEND_CACHE', '1') != '0':
+    static_cache.load(frontend_dir)
+    print(f"🗜️ Frontend cache: {len(static_cache.assets)} assets precompressed")
+
+def send_cached_asset(filename):
+    """Serve a cached asset with the negotiated encoding, or 304 if unchanged"""
+    asset = static_cache.get(filename)
+    if asset is None:
+        return send_from_directory(frontend_dir, filename)
+    
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding'), asset.variants)
+    if encoding is None:
+        return Response('Not Acceptable', status=406, headers={'Vary': 'Accept-Encoding'})
+    etag = asset.etag(encoding)
+    headers = {
+        'ETag': etag,
+        'Cache-Control': asset.cache_control,
+        'Vary': 'Accept-Encoding'
+    }
+    
+    if request.if_none_match.contains_weak(etag.strip('"')):
+        return Response(status=304, headers=headers)
+    
+    if encoding != 'identity':
+        headers['Content-Encoding'] = encoding
+    return Response(asset.variants[encoding], content_type=asset.content_type, headers=headers)
+
 # Frontend Routes
 @app.route('/')
 def index():
     """Serve main HTML page"""
-    frontend_dir = os.path.join(current_dir, 'frontend')
-    return send_from_directory(frontend_dir, 'index.html')
+    return send_cached_asset('index.html')
 
 @app.route('/<path:filename>')
 def serve_frontend(filename):
     """Serve static files from frontend directory"""
-    frontend_dir = os.path.join(current_dir, 'frontend')
-    return send_from_directory(frontend_dir, filename)
+    return send_cached_asset(filename)
 
 # API Routes
 @app.route('/api/download', methods=['POST'])
 def start_download():
-    """Start a new download with speed optimization"""
-    global download_active
-    
+    """Queue a new download with speed optimization"""
     try:
         data = request.get_json()
         
         if not data or 'url' not in data:
             return jsonify({'error': 'URL diperlukan'}), 400
         
-        # Check if already downloading
-        with download_lock:
-            if download_active:
-                return jsonify({'error': 'Download sedang berjalan, tunggu atau batalkan dulu'}), 400
-            download_active = True
-        
         # Extract parameters
         url = data['url']
         quality = data.get('quality', 'best')
@@ -83,8 +128,10 @@ def start_download():
         custom_path = data.get('path', None)
         concurrent_fragments = data.get('concurrent_fragments', 5)
         max_speed = data.get('max_speed', None)
+        client_id = get_client_id()
         
         print(f"📥 Download request received:")
+        print(f"   Client: {client_id}")
         print(f"   URL: {url}")
         print(f"   Quality: {quality}")
         print(f"   Format: {format_type}")
@@ -94,8 +141,6 @@ def start_download():
         
         # Validate URL
         if 'youtube.com' not in url and 'youtu.be' not in url:
-            with download_lock:
-                download_active = False
             return jsonify({'error': 'URL YouTube tidak valid'}), 400
         
         # Validate concurrent fragments
@@ -106,32 +151,25 @@ def start_download():
         except:
             concurrent_fragments = 5
         
-        # Start download in separate thread
-        def download_task():
-            global download_active
-            try:
-                downloader.download_video(
-                    url=url,
-                    quality=quality,
-                    format_type=format_type,
-                    custom_path=custom_path,
-                    max_speed=max_speed,
-                    concurrent_fragments=concurrent_fragments
-                )
-            except Exception as e:
-                print(f"❌ Error in download thread: {e}")
-            finally:
-                with download_lock:
-                    download_active = False
-        
-        # Start thread
-        download_thread = threading.Thread(target=download_task)
-        download_thread.daemon = True
-        download_thread.start()
+        # Queue job; the scheduler serves clients round-robin per priority lane
+        try:
+            job = scheduler.submit(client_id, {
+                'url': url,
+                'quality': quality,
+                'format_type': format_type,
+                'custom_path': custom_path,
+                'max_speed': max_speed,
+                'concurrent_fragments': concurrent_fragments
+            })
+        except QueueFullError:
+            return jsonify({'error': 'Antrian Anda penuh, tunggu sampai sebagian download selesai'}), 429
         
         return jsonify({
-            'message': 'Download dimulai dengan optimasi kecepatan',
-            'status': 'starting',
+            'message': 'Download dimasukkan ke antrian dengan optimasi kecepatan',
+            'status': 'queued',
+            'job_id': job.job_id,
+            'lane': job.lane,
+            'position': scheduler.queue_position(job.job_id),
             'concurrent_fragments': concurrent_fragments,
             'max_speed': max_speed or 'Tidak terbatas'
         }), 202
@@ -140,8 +178,6 @@ def start_download():
         print(f"❌ Error in start_download: {e}")
         import traceback
         traceback.print_exc()
-        with download_lock:
-            download_active = False
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/status', methods=['GET'])
@@ -160,13 +196,40 @@ def get_status():
 
 @app.route('/api/cancel', methods=['POST'])
 def cancel_download():
-    """Cancel current download"""
-    global download_active
+    """Cancel the caller's job (by job_id), or the caller's running download"""
     try:
-        success = downloader.cancel_download()
-        if success:
-            with download_lock:
-                download_active = False
+        data = request.get_json(silent=True) or {}
+        job_id = data.get('job_id')
+        
+        if job_id is not None:
+            try:
+                job_id = int(job_id)
+            except (TypeError, ValueError):
+                return jsonify({'error': 'job_id tidak valid'}), 400
+            
+            # A job id only ever cancels that client's own queued or running job
+            job = scheduler.get_job(job_id, get_client_id())
+            if not job:
+                return jsonify({
+                    'success': False,
+                    'message': 'Job tidak ditemukan'
+                })
+            
+            success = scheduler.cancel_job(job_id)
+            if not success:
+                message = 'Job sudah selesai' if job['status'] not in ('queued', 'running') else 'Gagal membatalkan job'
+            elif job['status'] == 'queued':
+                message = 'Job berhasil dihapus dari antrian'
+            else:
+                message = 'Download berhasil dibatalkan'
+            return jsonify({
+                'success': success,
+                'message': message
+            })
+        
+        # Without a job id, only the caller's own running download is cancelled
+        running = [job for job in scheduler.client_jobs(get_client_id()) if job['status'] == 'running']
+        if running and scheduler.cancel_job(running[0]['job_id']):
             return jsonify({
                 'success': True,
                 'message': 'Download berhasil dibatalkan'
@@ -178,18 +241,103 @@ def cancel_download():
             })
     except Exception as e:
         print(f"❌ Error cancelling download: {e}")
-        with download_lock:
-            download_active = False
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/is-busy', methods=['GET'])
 def check_busy():
-    """Check if server is busy downloading"""
-    with download_lock:
-        return jsonify({
-            'busy': download_active,
-            'status': 'downloading' if download_active else 'idle'
-        })
+    """Check if this client has a download running or queued"""
+    jobs = scheduler.client_jobs(get_client_id())
+    busy = bool(jobs)
+    return jsonify({
+        'busy': busy,
+        'status': 'downloading' if busy else 'idle',
+        'job_id': jobs[0]['job_id'] if jobs else None,
+        'server_busy': scheduler.is_busy()
+    })
+
+@app.route('/api/queue', methods=['GET'])
+def queue_stats():
+    """Queue depth and per-lane wait time percentiles"""
+    return jsonify(scheduler.get_stats())
+
+@app.route('/api/jobs/<int:job_id>', methods=['GET'])
+def job_status(job_id):
+    """Get the scheduling state of one of this client's jobs"""
+    job = scheduler.get_job(job_id, get_client_id())
+    if not job:
+        return jsonify({'error': 'Job tidak ditemukan'}), 404
+    job['position'] = scheduler.queue_position(job_id)
+    return jsonify(job)
+
+@app.route('/api/export', methods=['GET', 'POST'])
+def export_downloads():
+    """Stream completed downloads as one ZIP64 archive (no temp file)"""
+    downloads_dir = os.path.realpath(os.path.expanduser("~/Downloads/YouTube_Downloads"))
+    
+    if request.method == 'POST':
+        data = request.get_json(silent=True)
+        if data is None:
+            data = {}
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Body harus berupa objek JSON'}), 400
+        job_ids = data.get('job_ids') or []
+        if not isinstance(job_ids, list):
+            return jsonify({'error': 'job_ids harus berupa list'}), 400
+    else:
+        job_ids = request.args.getlist('job_ids')
+    
+    # Only completed jobs of this client are exported, never arbitrary files
+    client_id = get_client_id()
+    paths = []
+    for job_id in job_ids:
+        try:
+            job = scheduler.get_job(int(job_id), client_id)
+        except (TypeError, ValueError):
+            job = None
+        if not job or job['status'] != 'completed':
+            return jsonify({'error': f'Job {job_id} belum selesai atau tidak ditemukan'}), 400
+        if job['playlist']:
+            for entry_id in job['playlist']['entries']:
+                entry = scheduler.get_job(entry_id, client_id)
+                if entry and entry['status'] == 'completed' and entry['filepath']:
+                    paths.append(entry['filepath'])
+        elif job['filepath']:
+            paths.append(job['filepath'])
+    
+    if not paths:
+        return jsonify({'error': 'Pilih minimal satu download yang selesai (job_ids)'}), 400
+    
+    # A file that is being written right now would come out truncated
+    status = downloader.get_status()
+    in_progress = None
+    if status['status'] in ('starting', 'downloading') and status.get('filepath'):
+        in_progress = os.path.realpath(status['filepath'])
+    
+    files = []
+    for path in paths:
+        path = os.path.realpath(path)
+        # Only files inside the downloads folder may be exported
+        if os.path.commonpath([path, downloads_dir]) != downloads_dir or not os.path.isfile(path):
+            return jsonify({'error': f'File tidak ditemukan: {os.path.basename(path)}'}), 404
+        if path.endswith(('.part', '.ytdl')) or path == in_progress:
+            return jsonify({'error': f'File masih diunduh: {os.path.basename(path)}'}), 409
+        # ZIP entry names always use forward slashes
+        files.append((path, os.path.relpath(path, downloads_dir).replace(os.sep, '/')))
+    
+    archive = ZipStream(files)
+    filename = time.strftime('YouTube_Downloads_%Y%m%d_%H%M%S.zip')
+    print(f"📦 Exporting {len(files)} file(s) as {filename} ({archive.content_length()} bytes)")
+    
+    return Response(
+        archive,
+        mimetype='application/zip',
+        headers={
+            'Content-Length': str(archive.content_length()),
+            'Content-Disposition': f'attachment; filename="{filename}"',
+            'Cache-Control': 'no-store'
+        },
+        direct_passthrough=True
+    )
 
 @app.route('/api/check-cookies', methods=['GET'])
 def check_cookies():
@@ -215,7 +363,7 @@ def health_check():
         'timestamp': time.time(),
         'service': 'YouTube Downloader Pro',
         'version': '2.0.1',
-        'busy': download_active
+        'busy': scheduler.is_busy()
     })
 
 # Error handlers
@@ -232,23 +380,35 @@ def server_error(error):
 @app.route('/api/debug-test', methods=['GET'])
 def debug_test():
     """Test yt-dlp connectivity"""
-    import subprocess
     test_url = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
     
     try:
-        # Simple test command
-        cmd = ['yt-dlp', '--version']
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        started = time.time()
+        version = downloader.get_ytdlp_version()
         
         return jsonify({
-            'yt_dlp_version': result.stdout.strip() if result.returncode == 0 else 'Not found',
-            'error': result.stderr[:200] if result.returncode != 0 else None,
+            'yt_dlp_version': version or 'Not found',
+            'error': None if version else 'yt-dlp tidak tersedia',
+            'engine': downloader.engine,
+            'worker_pool': downloader.worker_pool.get_stats() if downloader.worker_pool else None,
+            'elapsed': round(time.time() - started, 3),
             'test_url': test_url,
             'time': time.time()
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/debug/locks', methods=['GET'])
+def debug_locks():
+    """Lock wait/hold statistics (enable with LOCK_PROFILING=1)"""
+    return jsonify(lock_profiler.snapshot())
+
+@app.route('/api/debug/locks/reset', methods=['POST'])
+def reset_debug_locks():
+    """Start a new lock statistics window"""
+    lock_profiler.reset()
+    return jsonify(lock_profiler.snapshot())
+
 if __name__ == '__main__':
     # Ensure directories exist
     ensure_directories()